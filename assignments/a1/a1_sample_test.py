@@ -17,8 +17,29 @@ please see
 Note: this file is for support purposes only, and is not part of your
 submission.
 """
+from collections import deque
+import copy
+import csv
+import json
+import pickle
+import random
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+import benchmark
+import sweep
+import traces
 from algorithms import PushyPassenger, RandomAlgorithm, ShortSighted, RandomArrivals, FileArrivals
-from simulation import Simulation
+from algorithms import StreamingFileArrivals, MappedFileArrivals
+from algorithms import WaitingFloors, lowest_waiting, closest_waiting
+from algorithms import CollectiveLook, Direction, HallCallDispatcher
+from records import PersonRecord, ElevatorRecord
+from running_stats import RunningStats
+from simulation import NullVisualizer, Simulation
+from vectorized import VectorSimulation
 
 
 def test_random_arrival_generator_zero() -> None:
@@ -203,6 +224,1020 @@ def test_short_sighted_moving_algorithm() -> None:
     assert results['avg_time'] == 4
 
 
+def test_headless_simulation_uses_plain_records() -> None:
+    """Test that a simulation that isn't visualized never creates sprites."""
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 2,
+        'arrival_generator': RandomArrivals(5, 2),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    sim.run(5)
+
+    for elevator in sim.elevators:
+        assert type(elevator) is ElevatorRecord
+    for people in sim.waiting.values():
+        for person in people:
+            assert type(person) is PersonRecord
+
+
+def test_headless_simulation_never_imports_pygame() -> None:
+    """Test that running a headless simulation doesn't import Pygame at all.
+    """
+    code = (
+        'import sys\n'
+        'import algorithms, simulation\n'
+        'sim = simulation.Simulation({'
+        '"num_floors": 5, "num_elevators": 2, "elevator_capacity": 2, '
+        '"arrival_generator": algorithms.RandomArrivals(5, 2), '
+        '"moving_algorithm": algorithms.PushyPassenger(), '
+        '"visualize": False})\n'
+        'sim.run(20)\n'
+        'assert "pygame" not in sys.modules\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+# Runs a small, fast visualized simulation with the dummy video driver, and
+# prints its statistics, those of the same simulation run headless, and the
+# number of frames drawn in each round.
+VISUALIZED_RUN = """
+import json, os, sys
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+import pygame, algorithms, simulation, visualizer
+frames = [0]
+def count_frame(*args):
+    frames[-1] += 1
+pygame.display.flip = pygame.display.update = count_frame
+render_header = visualizer.Visualizer.render_header
+def next_round(self, round_num):
+    frames.append(0)
+    render_header(self, round_num)
+visualizer.Visualizer.render_header = next_round
+stats = []
+for visualize in [True, False]:
+    sim = simulation.Simulation({
+        'num_floors': 5, 'num_elevators': 2, 'elevator_capacity': 2,
+        'arrival_generator': algorithms.RandomArrivals(5, 2, seed=4),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': visualize, 'dirty_rects': sys.argv[1] == 'dirty',
+        'max_frames': 4, 'time_scale': 10, 'render_every': int(sys.argv[2])})
+    stats.append(sim.run(8))
+print(json.dumps([stats, frames[1:]]))
+"""
+
+
+@pytest.mark.parametrize('mode', ['dirty', 'full'])
+def test_visualizer_skips_frames(mode) -> None:
+    """Test that a visualized simulation draws at most max_frames frames a
+    round (plus one to show the end of the round), in both rendering modes,
+    and reports the same statistics as a headless one.
+    """
+    output = subprocess.run([sys.executable, '-c', VISUALIZED_RUN, mode, '1'],
+                            check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout
+    stats, frames = json.loads(output.splitlines()[-1])
+    assert stats[0] == stats[1]
+    assert len(frames) == 8
+    assert all(1 <= count <= 5 for count in frames)
+
+
+def test_visualizer_fast_forwards_and_pauses() -> None:
+    """Test that only every render_every-th round is drawn, that the
+    window's keys pause, step and change the time scale, and that nothing
+    pauses without a display.
+    """
+    output = subprocess.run([sys.executable, '-c', VISUALIZED_RUN, 'dirty',
+                             '3'],
+                            check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True).stdout
+    stats, frames = json.loads(output.splitlines()[-1])
+    assert stats[0] == stats[1]
+    assert [count > 0 for count in frames] == \
+        [True, False, False, True, False, False, True, False]
+
+    code = (
+        'import os, time\n'
+        'os.environ["SDL_VIDEODRIVER"] = "dummy"\n'
+        'import pygame, visualizer\n'
+        'from entities import Elevator\n'
+        'vis = visualizer.Visualizer([Elevator([], 2)], 3, True, '
+        'time_scale=4)\n'
+        'def press(key):\n'
+        '    return vis._handle_event(pygame.event.Event(pygame.KEYDOWN, '
+        'key=key))\n'
+        'assert not press(pygame.K_RIGHT)\n'
+        'press(pygame.K_SPACE)\n'
+        'assert not vis._paused and not press(pygame.K_RIGHT)\n'
+        '# Act as if there were a display from here on.\n'
+        'vis._interactive = True\n'
+        'press(pygame.K_SPACE)\n'
+        'assert press(pygame.K_RIGHT)\n'
+        'press(pygame.K_UP)\n'
+        'press(pygame.K_UP)\n'
+        'assert vis._time_scale == visualizer.MAX_TIME_SCALE\n'
+        'pygame.event.post(pygame.event.Event(pygame.KEYDOWN, '
+        'key=pygame.K_RIGHT))\n'
+        'start = time.perf_counter()\n'
+        'vis.wait(5)\n'
+        'assert time.perf_counter() - start < 1\n'
+        'press(pygame.K_SPACE)\n'
+        'start = time.perf_counter()\n'
+        'vis.wait(1)\n'
+        'assert 0.09 < time.perf_counter() - start < 1\n'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+@pytest.mark.parametrize('drop_frames', [False, True])
+def test_frame_recorder_waits_for_or_drops_frames(tmp_path, monkeypatch,
+                                                  drop_frames) -> None:
+    """Test that capturing waits for a slow writer unless asked to drop
+    frames, and that the raw recording holds exactly the frames that weren't
+    dropped.
+    """
+    import threading
+    import pygame
+    from recording import FrameRecorder, read_raw_frames
+    filename = str(tmp_path / 'run.raw')
+    recorder = FrameRecorder(filename, (4, 3), queue_size=1,
+                             drop_frames=drop_frames)
+    release = threading.Event()
+    write = recorder._write
+
+    def slow_write(number: int, pixels: bytes) -> None:
+        release.wait()
+        write(number, pixels)
+
+    monkeypatch.setattr(recorder, '_write', slow_write)
+    threading.Timer(0.2, release.set).start()
+    surface = pygame.Surface((4, 3))
+    for shade in range(10):
+        surface.fill((shade, shade, shade))
+        recorder.capture(surface)
+    release.set()
+    recorder.close()
+
+    frames = list(read_raw_frames(filename))
+    assert recorder.captured == 10
+    assert (recorder.dropped > 0) == drop_frames
+    assert len(frames) == 10 - recorder.dropped
+    assert frames[0] == ((4, 3), bytes(4 * 3 * 3))
+
+
+def test_offscreen_run_is_recorded(tmp_path) -> None:
+    """Test that an offscreen run saves every frame it draws, to a raw file or
+    to a directory of images, and sets the video driver back when done.
+    """
+    code = (
+        'import os, sys, algorithms, simulation\n'
+        'sim = simulation.Simulation({'
+        '"num_floors": 4, "num_elevators": 1, "elevator_capacity": 2, '
+        '"arrival_generator": algorithms.RandomArrivals(4, 1, seed=2), '
+        '"moving_algorithm": algorithms.ShortSighted(), "visualize": True, '
+        '"record": sys.argv[1], "offscreen": True})\n'
+        'sim.run(5)\n'
+        'recorder = sim.visualizer._recorder\n'
+        'assert recorder.dropped == 0 and not recorder._thread.is_alive()\n'
+        'assert "SDL_VIDEODRIVER" not in os.environ\n'
+        'print(recorder.captured)\n'
+    )
+    from recording import read_raw_frames
+    for name in ['run.raw', 'frames']:
+        path = str(tmp_path / name)
+        output = subprocess.run([sys.executable, '-c', code, path],
+                                check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        captured = int(output.splitlines()[-1])
+        if name == 'frames':
+            assert len(list((tmp_path / name).iterdir())) == captured
+        else:
+            assert len(list(read_raw_frames(path))) == captured
+        assert captured > 5 * 20
+
+
+def test_sweep_is_reproducible(tmp_path) -> None:
+    """Test that a parallel sweep writes one row per configuration, and that
+    running it again with the same seed gives exactly the same results.
+    """
+    grid = {
+        'num_floors': [4, 6],
+        'num_elevators': [1, 2],
+        'elevator_capacity': [2],
+        'num_people_per_round': [1],
+        'moving_algorithm': ['random', 'short_sighted']
+    }
+    results = []
+    for name in ['first.csv', 'second.csv']:
+        output = str(tmp_path / name)
+        assert sweep.sweep(grid, 20, output, processes=2, seed=7) == 8
+        with open(output) as csvfile:
+            rows = sorted(csv.DictReader(csvfile), key=lambda r: int(r['run']))
+        results.append(rows)
+
+    assert len(results[0]) == 8
+    assert results[0] == results[1]
+    for row in results[0]:
+        assert row['num_iterations'] == '20'
+        assert row['total_people'] == '20'
+
+
+def test_leaving_uses_arrival_round() -> None:
+    """Test that everyone whose target is the elevator's floor leaves together,
+    and that their wait time is counted from the round they arrived in.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 1,
+        'elevator_capacity': 3,
+        'num_people_per_round': 0,
+        'arrival_generator': RandomArrivals(5, 0),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    elevator = sim.elevators[0]
+    elevator.floor = 3
+    for arrival, target in [(0, 3), (2, 3), (1, 4)]:
+        person = PersonRecord()
+        person.get_target(target)
+        person.arrival_round = arrival
+        elevator.board([person])
+        sim.waiting_people.add(person)
+
+    sim._handle_leaving(5)
+
+    assert [p.target for p in elevator.passengers] == [4]
+    assert sim.waiting_people == set(elevator.passengers)
+    assert sim.round_stat['people_completed'] == 2
+    assert sim.wait_stats.minimum == 3
+    assert sim.wait_stats.maximum == 5
+
+
+def test_boarding_takes_people_in_arrival_order() -> None:
+    """Test that an elevator takes as many waiting people as it has room for,
+    first come first served, and leaves the rest waiting.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 1,
+        'elevator_capacity': 3,
+        'num_people_per_round': 0,
+        'arrival_generator': RandomArrivals(5, 0),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    people = []
+    for target in [2, 3, 2, 4, 5]:
+        person = PersonRecord()
+        person.get_target(target)
+        people.append(person)
+    sim.waiting[1] = deque(people)
+    sim.waiting.update_floor(1)
+
+    sim._handle_boarding()
+
+    assert sim.elevators[0].passengers == people[:3]
+    assert list(sim.waiting[1]) == people[3:]
+    sim.elevators[0].floor = 2
+    assert sim.elevators[0].unload() == [people[0], people[2]]
+    assert sim.elevators[0].passengers == [people[1]]
+
+
+def test_passengers_get_off_however_they_got_on() -> None:
+    """Test that passengers given to the constructor, appended to the list
+    of passengers or put in a new list all get off at their target floor.
+    """
+    import pickle
+    people = []
+    for target in [2, 3, 2, 3]:
+        person = PersonRecord()
+        person.get_target(target)
+        people.append(person)
+    elevator = ElevatorRecord([people[0]], 4)
+    elevator.passengers.append(people[1])
+    elevator.passengers.extend([people[2]])
+    elevator.floor = 2
+    assert elevator.unload() == [people[0], people[2]]
+    assert elevator.passengers == [people[1]]
+
+    elevator.passengers = [people[3], people[1]]
+    assert elevator.passengers[1] is people[1]
+    elevator.passengers.remove(people[1])
+    elevator = pickle.loads(pickle.dumps(elevator))
+    elevator.floor = 3
+    assert [person.target for person in elevator.unload()] == [3]
+    assert elevator.is_empty() and elevator.unload() == []
+
+
+def write_random_trace(filename: str, max_floor: int, num_rounds: int,
+                       seed: int) -> None:
+    """Write a random arrivals file in the same format as sample_arrivals.csv.
+    """
+    rng = random.Random(seed)
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for round_num in range(num_rounds):
+            row = [round_num]
+            for _ in range(rng.randint(0, 3)):
+                start, target = rng.sample(range(1, max_floor + 1), 2)
+                row.extend([start, target])
+            if len(row) > 1:
+                writer.writerow(row)
+
+
+@pytest.mark.parametrize('capacity', [1, 4])
+@pytest.mark.parametrize('algorithm', [PushyPassenger, ShortSighted])
+def test_vector_simulation_matches_simulation(tmp_path, algorithm,
+                                              capacity) -> None:
+    """Test that the vectorized engine reports exactly the same statistics as
+    the object simulation for the same arrivals.
+    """
+    trace = str(tmp_path / 'arrivals.csv')
+    write_random_trace(trace, 8, 60, seed=3)
+    results = []
+    for engine in [Simulation, VectorSimulation]:
+        config = {
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': capacity,
+            'num_people_per_round': None,
+            'arrival_generator': FileArrivals(8, trace),
+            'moving_algorithm': algorithm(),
+            'visualize': False
+        }
+        results.append(engine(config).run(80))
+    assert results[0]['people_completed'] > 0
+    assert results[0] == results[1]
+
+
+def arrival_pairs(arrivals: dict) -> list:
+    """Return the sorted (start, target) pairs of the people in <arrivals>."""
+    return sorted((p.start, p.target)
+                  for people in arrivals.values() for p in people)
+
+
+def test_streaming_and_mapped_arrivals_match_file_arrivals(tmp_path) -> None:
+    """Test that the streaming CSV and memory-mapped binary generators give
+    the same arrivals as FileArrivals, round by round.
+    """
+    trace = str(tmp_path / 'arrivals.csv')
+    binary = str(tmp_path / 'arrivals.bin')
+    write_random_trace(trace, 6, 40, seed=5)
+    people = traces.write_binary_trace(trace, binary)
+
+    expected = FileArrivals(6, trace)
+    streaming = StreamingFileArrivals(6, trace)
+    mapped = MappedFileArrivals(6, binary)
+    for generator in [expected, streaming, mapped]:
+        generator.person_class = PersonRecord
+    total = 0
+    for round_num in range(45):
+        pairs = arrival_pairs(expected.generate(round_num))
+        total += len(pairs)
+        assert arrival_pairs(streaming.generate(round_num)) == pairs
+        assert arrival_pairs(mapped.generate(round_num)) == pairs
+    assert total == people
+    mapped.close()
+    assert mapped.generate(45) == {}
+
+
+def test_compiled_trace_matches_file_arrivals(tmp_path) -> None:
+    """Test that a compiled trace gives the same arrivals as FileArrivals in
+    any order of rounds, even when the CSV trace isn't sorted by round.
+    """
+    from algorithms import CompiledFileArrivals
+    trace = str(tmp_path / 'arrivals.csv')
+    compiled = str(tmp_path / 'arrivals.col')
+    write_random_trace(trace, 6, 40, seed=5)
+    with open(trace) as csvfile:
+        lines = csvfile.readlines()
+    random.Random(1).shuffle(lines)
+    with open(trace, 'w') as csvfile:
+        csvfile.writelines(lines + ['7,3,1\n'])
+    people = traces.compile_trace(trace, compiled)
+
+    expected = FileArrivals(6, trace)
+    replayed = CompiledFileArrivals(6, compiled)
+    for generator in [expected, replayed]:
+        generator.person_class = PersonRecord
+    assert people == sum(map(len, expected.initial.values())) // 2
+    for round_num in reversed(range(-2, 45)):
+        assert replayed.arrival_floors(round_num) == \
+            expected.arrival_floors(round_num)
+        assert replayed.next_arrival_round(round_num) == \
+            expected.next_arrival_round(round_num)
+        pool = replayed.generate_pool(round_num)
+        assert list(pool.start) == expected.arrival_floors(round_num)[::2]
+    replayed.close()
+    assert replayed.generate(7) == {}
+    with pytest.raises(ValueError):
+        CompiledFileArrivals(6, trace)
+
+
+def test_streaming_arrivals_skip_past_rounds() -> None:
+    """Test that skipping rounds drops the arrivals of the skipped rounds."""
+    streaming = StreamingFileArrivals(5, 'sample_arrivals.csv')
+    assert arrival_pairs(streaming.generate(3)) == [(1, 2)]
+    assert arrival_pairs(streaming.generate(5)) == [(4, 2)]
+    assert streaming.generate(6) == {}
+
+
+def test_running_stats_match_batch_statistics() -> None:
+    """Test the online statistics against statistics computed from the whole
+    list of values, including values added several times at once.
+    """
+    rng = random.Random(11)
+    values = [rng.randint(0, 40) for _ in range(500)]
+    stats = RunningStats()
+    for value in values[:250]:
+        stats.add(value)
+    for value in set(values[250:]):
+        stats.add(value, values[250:].count(value))
+
+    ordered = sorted(values)
+    assert stats.count == 500
+    assert stats.minimum == ordered[0]
+    assert stats.maximum == ordered[-1]
+    assert stats.mean() == sum(values) / 500
+    assert abs(stats.variance() - statistics.pvariance(values)) < 1e-9
+    assert stats.percentile(50) == ordered[249]
+    assert stats.percentile(95) == ordered[474]
+    assert stats.percentile(100) == ordered[-1]
+
+    # Merging the statistics of two halves gives those of the whole.
+    halves = [RunningStats(), RunningStats()]
+    for index, value in enumerate(values):
+        halves[index % 2].add(value)
+    halves[0].merge(halves[1])
+    halves[0].merge(RunningStats())
+    assert halves[0].summary()['p95'] == stats.summary()['p95']
+    assert halves[0].total == stats.total
+    assert abs(halves[0].variance() - stats.variance()) < 1e-9
+
+
+def test_live_stats_during_run() -> None:
+    """Test that live statistics can be read between runs of a simulation."""
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 1,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    assert sim.live_stats()['count'] == 0
+    sim.run(10)
+    live = sim.live_stats()
+    assert live['count'] == 3
+    assert (live['min'], live['p50'], live['max']) == (3, 3, 6)
+    assert live['mean'] == 4
+
+
+def test_waiting_floors_index_matches_scan() -> None:
+    """Test that the indexed lowest/closest queries of WaitingFloors give the
+    same floors as scanning an ordinary dictionary, however its floors are
+    set or deleted.
+    """
+    rng = random.Random(2)
+    max_floor = 30
+    indexed = WaitingFloors()
+    plain = {}
+    for step in range(300):
+        floor = rng.randint(1, max_floor)
+        people = [PersonRecord() for _ in range(rng.choice([0, 0, 1, 2]))]
+        if step % 10 == 0 and floor in plain:
+            del indexed[floor]
+            del plain[floor]
+        elif step % 10 == 1:
+            indexed.update({floor: people})
+            plain[floor] = list(people)
+        else:
+            indexed[floor] = list(people)
+            plain[floor] = list(people)
+        if step % 50 == 0:
+            indexed = pickle.loads(pickle.dumps(indexed))
+
+        assert indexed.nonempty == sorted(f for f in plain if plain[f])
+        assert lowest_waiting(indexed, max_floor) == \
+            lowest_waiting(plain, max_floor)
+        current = rng.randint(1, max_floor)
+        assert closest_waiting(indexed, max_floor, current) == \
+            closest_waiting(plain, max_floor, current)
+
+
+def test_seeded_random_arrivals_are_reproducible() -> None:
+    """Test that random arrival generators with the same seed generate the
+    same people, and never a person whose target is their start floor.
+    """
+    first = RandomArrivals(4, 50, seed=9)
+    second = RandomArrivals(4, 50, seed=9)
+    for generator in [first, second]:
+        generator.person_class = PersonRecord
+    for round_num in range(5):
+        pairs = arrival_pairs(first.generate(round_num))
+        assert pairs == arrival_pairs(second.generate(round_num))
+        assert len(pairs) == 50
+        assert all(1 <= s <= 4 and 1 <= t <= 4 and s != t for s, t in pairs)
+
+
+def test_recorded_random_run_replays_exactly(tmp_path) -> None:
+    """Test that a recorded random run can be replayed from its saved trace
+    with exactly the same results.
+    """
+    trace = str(tmp_path / 'recorded.csv')
+    recording = RandomArrivals(8, 3, seed=4, record=True)
+    results = []
+    for generator in [recording, None]:
+        if generator is None:
+            recording.save_trace(trace)
+            generator = FileArrivals(8, trace)
+        config = {
+            'num_floors': 8,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'num_people_per_round': 3,
+            'arrival_generator': generator,
+            'moving_algorithm': RandomAlgorithm(seed=12),
+            'visualize': False
+        }
+        results.append(Simulation(config).run(40))
+    assert results[0]['total_people'] == 120
+    assert results[0] == results[1]
+
+
+def test_random_algorithm_moves_stay_in_building() -> None:
+    """Test that the random algorithm never moves an elevator off the
+    building, from any floor.
+    """
+    algorithm = RandomAlgorithm(seed=1)
+    elevators = [ElevatorRecord([], 1) for _ in range(3)]
+    for elevator, floor in zip(elevators, [1, 2, 3]):
+        elevator.floor = floor
+    for _ in range(50):
+        moves = algorithm.move_elevators(elevators, {}, 3)
+        assert moves[0].value >= 0
+        assert moves[2].value <= 0
+
+
+@pytest.mark.parametrize('algorithm', [PushyPassenger, ShortSighted])
+@pytest.mark.parametrize('generator', [FileArrivals, StreamingFileArrivals])
+def test_event_driven_run_matches_round_by_round(tmp_path, algorithm,
+                                                 generator) -> None:
+    """Test that an event-driven run of sparse arrivals skips idle rounds but
+    reports exactly the same statistics as simulating every round.
+    """
+    trace = str(tmp_path / 'sparse.csv')
+    traces.write_csv_trace(trace, [(0, [1, 7]), (3, [6, 2, 6, 1]),
+                                   (400, [4, 5]), (2000, [7, 1, 2, 3])])
+    sims = []
+    for event_driven in [False, True]:
+        config = {
+            'num_floors': 7,
+            'num_elevators': 2,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': generator(7, trace),
+            'moving_algorithm': algorithm(),
+            'visualize': False,
+            'event_driven': event_driven
+        }
+        sim = Simulation(config)
+        sim.run(3000)
+        sims.append(sim)
+
+    assert sims[0].round_stat['people_completed'] == 6
+    assert sims[0].round_stat == sims[1].round_stat
+    assert sims[0]._simulated_rounds == 3000
+    assert sims[1]._simulated_rounds < 100
+
+
+def test_profiling_records_every_stage(tmp_path) -> None:
+    """Test that a profiled simulation records each stage once per round,
+    can write its calls as a Chrome trace, and can still be copied.
+    """
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 1,
+        'num_people_per_round': 2,
+        'arrival_generator': FileArrivals(5, 'sample_arrivals.csv'),
+        'moving_algorithm': ShortSighted(),
+        'visualize': False
+    }
+    sim = Simulation(config)
+    profiler = sim.enable_profiling()
+    results = sim.run(10)
+    assert results['people_completed'] == 3
+
+    for stage in ['generate_arrivals', 'handle_leaving', 'handle_boarding',
+                  'move_elevators', 'ShortSighted.move_elevators',
+                  'visualizer.wait']:
+        assert profiler.calls[stage] == 10
+    assert profiler.calls['visualizer.close'] == 1
+    assert 'move_elevators' in profiler.summary()
+    copied = pickle.loads(pickle.dumps(sim))
+    assert copied.profiler.calls == profiler.calls
+
+    trace = str(tmp_path / 'trace.json')
+    profiler.write_chrome_trace(trace)
+    with open(trace) as trace_file:
+        assert len(json.load(trace_file)['traceEvents']) == \
+            sum(profiler.calls.values())
+
+    sim.disable_profiling()
+    sim.run(15)
+    assert sim.profiler is None and isinstance(sim.visualizer, NullVisualizer)
+    assert profiler.calls['generate_arrivals'] == 10
+    assert copy.deepcopy(sim).run(20) == sim.run(20)
+
+
+def test_look_sends_one_elevator_per_floor() -> None:
+    """Test that two empty elevators don't both chase the same waiting floor,
+    and that a loaded elevator keeps going while targets remain ahead.
+    """
+    elevators = [ElevatorRecord([], 3) for _ in range(3)]
+    waiting = WaitingFloors()
+    waiting[5] = [PersonRecord()]
+    waiting.update_floor(5)
+    rider_up, rider_down = PersonRecord(), PersonRecord()
+    rider_up.get_target(9)
+    rider_down.get_target(2)
+    elevators[2].passengers.extend([rider_down, rider_up])
+    elevators[2].floor = 4
+
+    look = CollectiveLook()
+    moves = look.move_elevators(elevators[:2], waiting, 10)
+    assert sorted(move.value for move in moves) == [0, 1]
+
+    # Floor 5 is on the way of the loaded elevator going up, so neither
+    # empty elevator is sent there.
+    look = CollectiveLook()
+    look.setstate(([0, 0, 1], [0, 0, 0]))
+    moves = look.move_elevators(elevators, waiting, 10)
+    assert moves == [Direction.STAY, Direction.STAY, Direction.UP]
+    elevators[2].floor = 5
+    assert look.move_elevators(elevators, waiting, 10)[2] == Direction.UP
+
+
+@pytest.mark.parametrize('scenario', [(20, 4, 6, 2), (10, 2, 10, 3),
+                                      (50, 8, 8, 2)])
+def test_look_beats_the_other_algorithms_under_load(scenario) -> None:
+    """Test that the LOOK dispatcher has the lowest average and maximum wait
+    times, averaged over several seeds, in buildings whose elevators are
+    kept busy (see CollectiveLook).
+    """
+    names = ['look', 'pushy', 'random', 'short_sighted']
+    totals = {name: [0, 0] for name in names}
+    for seed in range(5):
+        results = benchmark.compare_algorithms(*scenario, 1000, seed=seed,
+                                               names=names)
+        for name, stats in results.items():
+            totals[name][0] += stats['avg_time']
+            totals[name][1] += stats['max_time']
+    look = totals.pop('look')
+    for avg_time, max_time in totals.values():
+        assert look[0] < avg_time
+        assert look[1] < max_time
+
+
+def test_generate_pool_matches_generate(tmp_path) -> None:
+    """Test that a generator's PersonPool holds the same people generate
+    would have created, and that a pool takes less memory than records.
+    """
+    trace = str(tmp_path / 'arrivals.csv')
+    write_random_trace(trace, 8, 20, seed=5)
+    generators = [RandomArrivals(8, 4, seed=2), RandomArrivals(8, 4, seed=2),
+                  FileArrivals(8, trace), FileArrivals(8, trace)]
+    for generator in generators:
+        generator.person_class = PersonRecord
+    for round_num in range(20):
+        for by_people, by_pool in [generators[:2], generators[2:]]:
+            pool = by_pool.generate_pool(round_num)
+            assert list(pool.arrival) == [round_num] * len(pool)
+            people = [pool.person(index) for index in range(len(pool))]
+            assert arrival_pairs({0: people}) == \
+                arrival_pairs(by_people.generate(round_num))
+
+    assert benchmark.memory_per_person('pool', 10000) < \
+        benchmark.memory_per_person('record', 10000) / 2
+
+
+def test_person_images_are_loaded_once(monkeypatch) -> None:
+    """Test that person sprites of the same anger level share one image, which
+    is decoded the first time it is needed, and converted to the screen's
+    pixel format once there is a screen.
+    """
+    import pygame
+    import sprites
+    from entities import Person
+    loads = []
+    load = pygame.image.load
+
+    def counted_load(filename: str) -> pygame.Surface:
+        loads.append(filename)
+        return load(filename)
+
+    monkeypatch.setattr(sprites, '_PERSON_IMAGES', {})
+    monkeypatch.setattr(pygame.image, 'load', counted_load)
+    people = [Person() for _ in range(3)]
+    assert loads == [sprites.FIGURES[0]]
+    assert people[0].image is people[2].image
+
+    people[1].wait_time = 9
+    assert people[1].load_image() is not people[0].image
+    assert people[1].load_image() is people[1].load_image()
+    assert loads == [sprites.FIGURES[0], sprites.FIGURES[4]]
+
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    try:
+        pygame.display.set_mode((10, 10))
+        converted = people[0].load_image()
+        assert converted is not people[0].image
+        assert people[2].load_image() is converted
+        assert loads == [sprites.FIGURES[0], sprites.FIGURES[4]]
+    finally:
+        pygame.display.quit()
+
+
+def test_dispatcher_sends_the_elevator_that_arrives_first() -> None:
+    """Test that each waiting floor goes to the elevator with the shortest
+    time to arrive, and that an empty elevator keeps its floor between rounds.
+    """
+    elevators = [ElevatorRecord([], 3) for _ in range(3)]
+    elevators[0].floor = 1
+    elevators[1].floor = 8
+    rider = PersonRecord()
+    rider.get_target(9)
+    elevators[2].passengers.append(rider)
+    elevators[2].floor = 6
+    waiting = WaitingFloors()
+    for floor in [2, 7]:
+        waiting[floor] = [PersonRecord()]
+        waiting.update_floor(floor)
+
+    # The loaded elevator reaches floor 7 as soon as the empty one on floor 8
+    # would, so only floor 2 needs an empty elevator.
+    dispatcher = HallCallDispatcher()
+    moves = dispatcher.move_elevators(elevators, waiting, 10)
+    assert moves == [Direction.UP, Direction.STAY, Direction.UP]
+
+    # With the loaded elevator full, the closest empty elevator takes floor 7
+    # and the one heading to floor 2 keeps going even though it is now
+    # closer to floor 7.
+    elevators[2].capacity = 1
+    elevators[0].floor = 5
+    moves = dispatcher.move_elevators(elevators, waiting, 10)
+    assert moves == [Direction.DOWN, Direction.DOWN, Direction.UP]
+
+
+def test_campus_runs_buildings_from_one_trace(tmp_path) -> None:
+    """Test that a campus gives each building the same statistics it would
+    get on its own, whether the buildings run cooperatively or in a pool,
+    and that the campus-wide statistics combine them.
+    """
+    import campus
+    buildings = {
+        'library': {'num_floors': 8, 'num_elevators': 2,
+                    'elevator_capacity': 3, 'moving_algorithm': 'look'},
+        'gym': {'num_floors': 4, 'num_elevators': 1, 'elevator_capacity': 2,
+                'moving_algorithm': 'short_sighted'},
+        'lab': {'num_floors': 6, 'num_elevators': 2, 'elevator_capacity': 4,
+                'moving_algorithm': 'random', 'seed': 3}
+    }
+    lines = []
+    alone = {}
+    for seed, (name, building) in enumerate(sorted(buildings.items())):
+        trace = str(tmp_path / f'{name}.csv')
+        write_random_trace(trace, building['num_floors'], 60, seed)
+        lines.extend((name, round_num, floors)
+                     for round_num, floors in traces.read_csv_trace(trace))
+        sim = campus.make_simulation(building, FileArrivals(8, trace))
+        alone[name] = dict(sim.run(50))
+    trace = str(tmp_path / 'campus.csv')
+    traces.write_campus_trace(trace, sorted(lines, key=lambda line: line[1]))
+
+    cooperative = campus.run_campus(buildings, trace, 50)
+    pooled = campus.run_campus(buildings, trace, 50, processes=2)
+    assert cooperative == pooled
+    per_building, whole = cooperative
+    assert per_building == alone
+    assert whole['total_people'] == sum(stats['total_people']
+                                        for stats in alone.values())
+    assert whole['max_time'] == max(stats['max_time']
+                                    for stats in alone.values())
+
+
+def test_profile_arrivals_follow_their_rates() -> None:
+    """Test that Poisson arrivals follow the rate of each floor and round,
+    that any round can be generated on its own, and that rounds without
+    arrivals are skipped by next_arrival_round.
+    """
+    from poisson import PoissonArrivals, ProfileArrivals, morning_rush
+    rates = morning_rush(6, 50, 1.2, 6.0, 20, 3)
+    generator = ProfileArrivals(6, rates, seed=8, block_size=64)
+    counts = [[0] * 6 for _ in range(50)]
+    for round_num in range(5000):
+        floors = generator.arrival_floors(round_num)
+        for start, target in zip(floors[::2], floors[1::2]):
+            assert 1 <= start <= 6 and 1 <= target <= 6 and start != target
+            counts[round_num % 50][start - 1] += 1
+    assert abs(counts[20][0] / 100 - rates[20][0]) < 0.6
+    assert abs(counts[0][0] / 100 - rates[0][0]) < 0.1
+    assert abs(sum(map(sum, counts)) / 5000 - rates.sum() / 50) < 0.1
+
+    fresh = ProfileArrivals(6, rates, seed=8, block_size=64)
+    fresh.person_class = PersonRecord
+    pool = fresh.generate_pool(4321)
+    assert list(pool.start) == generator.arrival_floors(4321)[::2]
+    assert list(pool.arrival) == [4321] * len(pool)
+
+    sparse = ProfileArrivals(4, [[0] * 4] * 9 + [[5] * 4], seed=1)
+    assert sparse.next_arrival_round(1) == 9
+    assert sparse.next_arrival_round(10) == 19
+    assert PoissonArrivals(4, 0).next_arrival_round(0) is None
+
+
+def test_benchmark_suite_compares_with_its_baseline(tmp_path) -> None:
+    """Test that the benchmark suite's results survive being saved as a
+    baseline, and that comparing against it catches slowdowns and changed
+    results but not a rerun of the same code.
+    """
+    baseline_file = str(tmp_path / 'baseline.json')
+    results = benchmark.run_suite(['small'], ['look', 'pushy'])
+    assert list(results) == ['small/look', 'small/pushy']
+    for result in results.values():
+        assert result['rounds_per_second'] > 0 and result['peak_memory'] > 0
+    benchmark.save_baseline(results, baseline_file)
+    baseline = benchmark.load_baseline(baseline_file)
+    assert baseline == results
+
+    rerun = benchmark.run_suite(['small'], ['look', 'pushy'],
+                                measure_memory=False)
+    assert benchmark.compare_to_baseline(rerun, baseline,
+                                         tolerance=10)[1] == []
+    for field in benchmark.RESULT_FIELDS:
+        assert rerun['small/look'][field] == baseline['small/look'][field]
+
+    baseline['small/look']['rounds_per_second'] *= 100
+    baseline['small/pushy']['avg_time'] += 1
+    table, regressions = benchmark.compare_to_baseline(rerun, baseline)
+    assert 'small/look' in table
+    assert len(regressions) == 2
+    assert regressions[0].startswith('small/look: rounds/s')
+    assert regressions[1] == 'small/pushy: results changed (avg_time)'
+
+
+@pytest.mark.parametrize('event_driven', [False, True])
+def test_resuming_from_a_checkpoint_matches_an_uninterrupted_run(
+        tmp_path, event_driven) -> None:
+    """Test that a simulation restored from a checkpoint written during a
+    run carries on exactly as the checkpointed simulation would have,
+    including its random number generators and how far it read its trace.
+    """
+    trace = str(tmp_path / 'arrivals.csv')
+    checkpoint = str(tmp_path / 'run.ckpt')
+    write_random_trace(trace, 12, 300, seed=3)
+    makers = [
+        lambda: (RandomArrivals(12, 3, seed=4), RandomAlgorithm(2)),
+        lambda: (StreamingFileArrivals(12, trace), CollectiveLook())
+    ]
+    for make in makers:
+        def config() -> dict:
+            generator, algorithm = make()
+            return {'num_floors': 12, 'num_elevators': 3,
+                    'elevator_capacity': 4, 'num_people_per_round': None,
+                    'arrival_generator': generator,
+                    'moving_algorithm': algorithm, 'visualize': False,
+                    'event_driven': event_driven}
+        expected = Simulation(config()).run(300)
+
+        interrupted = Simulation(config())
+        writer = interrupted.enable_checkpoints(checkpoint, 70)
+        interrupted.run(250)
+        interrupted.disable_checkpoints()
+        assert writer.written >= 1 and writer.last_round == 210
+
+        resumed = Simulation(config())
+        resumed.restore(checkpoint)
+        assert resumed.round_stat['num_iterations'] == 210
+        assert resumed.run(300) == expected
+
+
+def test_what_if_branches_are_paired_and_leave_the_simulation_alone(
+        ) -> None:
+    """Test that every branch of a what-if comparison sees the same
+    arrivals, that the branch of the snapshotted algorithm carries on
+    exactly as the simulation itself does, and that running the branches
+    in a pool gives the same statistics.
+    """
+    import whatif
+    sim = Simulation(benchmark.make_config(20, 4, 6, 2, 'look', 1))
+    sim.run(400)
+    config = benchmark.make_config(20, 4, 6, 2, 'look', 1)
+    results = whatif.compare_algorithms(sim, config, 200)
+    assert list(results) == sorted(sweep.ALGORITHMS)
+    assert len({stats['total_people'] for stats in results.values()}) == 1
+    assert results['look']['avg_time'] < results['random']['avg_time']
+
+    before = dict(sim.round_stat)
+    stats = sim.run(600)
+    assert results['look']['people_completed'] == \
+        stats['people_completed'] - before['people_completed']
+    assert results['look']['people_left'] == len(sim.waiting_people)
+
+    pooled = whatif.compare_from(whatif.Snapshot(Simulation(config)), config,
+                                 50, ['pushy', 'look'], processes=2)
+    alone = whatif.compare_from(whatif.Snapshot(Simulation(config)), config,
+                                50, ['pushy', 'look'])
+    assert list(pooled) == ['pushy', 'look'] and pooled == alone
+
+
+def test_what_if_branches_get_their_own_arrival_generators(tmp_path
+                                                           ) -> None:
+    """Test that each branch of a what-if comparison sees the same arrivals
+    even when the generator's state isn't all in getstate, and that a
+    memory-mapped generator can be given as a factory.
+    """
+    import functools
+    import whatif
+    from campus import BuildingArrivals
+    config = benchmark.make_config(10, 2, 4, 1, 'look', 0)
+    arrivals = BuildingArrivals(10)
+    for round_num in range(30):
+        arrivals.feed(round_num, [1 + round_num % 10, 10 - round_num % 9])
+    config['arrival_generator'] = arrivals
+    snapshot = whatif.Snapshot(Simulation(config))
+    both = whatif.compare_from(snapshot, config, 40, ['look', 'pushy'])
+    alone = whatif.compare_from(snapshot, config, 40, ['pushy'])
+    assert both['look']['total_people'] == both['pushy']['total_people'] == 30
+    assert both['pushy'] == alone['pushy']
+    assert len(arrivals.pending) == 30
+
+    trace = str(tmp_path / 'arrivals.csv')
+    binary = str(tmp_path / 'arrivals.bin')
+    write_random_trace(trace, 10, 40, seed=3)
+    people = traces.write_binary_trace(trace, binary)
+    config['arrival_factory'] = functools.partial(MappedFileArrivals, 10,
+                                                  binary)
+    config['arrival_generator'] = config['arrival_factory']()
+    snapshot = whatif.Snapshot(Simulation(config))
+    results = whatif.compare_from(snapshot, config, 50, ['look', 'pushy'])
+    assert results['look']['total_people'] == people
+    assert results['pushy']['total_people'] == people
+
+
+def test_live_service_spreads_bursts_and_reads_a_socket() -> None:
+    """Test that a live service takes at most max_people people into each
+    round, publishes every round's statistics, and ingests the arrivals
+    sent to its socket, dropping people whose floors aren't in the building.
+    """
+    import asyncio
+    import live
+
+    async def scenario() -> tuple:
+        service = live.LiveService({'num_floors': 10, 'num_elevators': 2,
+                                    'elevator_capacity': 4,
+                                    'moving_algorithm': 'look'},
+                                   tick=0.001, max_people=1000)
+        subscriber = service.subscribe(queue_size=1000)
+        await service.queue.put([1, 5] * 2500)
+        await service.queue.put([2, 3] * 600 + [9])
+        server = await live.serve_arrivals(service)
+        port = server.sockets[0].getsockname()[1]
+        run = asyncio.create_task(service.run())
+        _, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'3,7,4,8\nnot,floors\n0,5,6,6,10,11,2,1\n10,1\n')
+        await writer.drain()
+        writer.close()
+        published = []
+        while not published or published[-1]['total_people'] < 3104:
+            published.append(await asyncio.wait_for(subscriber.get(), 5))
+        service.stop()
+        await run
+        server.close()
+        await server.wait_closed()
+        return service, published
+
+    service, published = asyncio.run(scenario())
+    rounds = [stats['num_iterations'] for stats in published]
+    assert rounds == list(range(1, len(rounds) + 1))
+    arrived = [stats['arrived'] for stats in published]
+    assert arrived[:3] == [1000, 1000, 1000] and max(arrived) == 1000
+    assert sum(arrived) == 3104 and published[2]['backlog'] >= 1
+    assert published[-1]['total_people'] == 3104
+    assert service.rejected == 3
+    assert service.round_times.count == len(published)
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main(['a1_sample_test.py'])
@@ -0,0 +1,340 @@
+"""CSC148 Assignment 1 - Benchmarks
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module compares the moving algorithms on the same fixed-seed scenario.
+Every algorithm sees exactly the same arrivals, so differences in the wait
+time statistics come from the algorithms alone.
+
+It also measures how much memory each person takes in each of the ways a
+simulation can store people.
+
+Finally, it runs a suite of fixed-seed scenarios, from a small building to
+a large one, with every moving algorithm, and reports the speed (rounds and
+people per second) and peak memory of each run. The results of the suite
+can be saved as a JSON baseline, and later runs compared against it, so
+that a change that slows the simulation down or changes its results shows
+up run over run.
+
+Run this module from the command line, for example:
+
+    python benchmark.py --floors 100 --elevators 8 --rounds 2000
+    python benchmark.py --memory
+    python benchmark.py --suite --save baseline.json
+    python benchmark.py --suite --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import algorithms
+from records import PersonPool, PersonRecord
+from simulation import Simulation
+from sweep import ALGORITHMS
+
+
+# The ways of storing people that memory_per_person can measure.
+STORAGE_KINDS = ['sprite', 'record', 'pool']
+# The most sprites to create when measuring them.
+SPRITE_SAMPLE = 10000
+
+# The fixed-seed scenarios of the benchmark suite.
+SCENARIOS = {
+    'small': {'num_floors': 10, 'num_elevators': 2, 'elevator_capacity': 4,
+              'rate': 1, 'num_rounds': 2000},
+    'medium': {'num_floors': 50, 'num_elevators': 8, 'elevator_capacity': 8,
+               'rate': 4, 'num_rounds': 1000},
+    'large': {'num_floors': 200, 'num_elevators': 50,
+              'elevator_capacity': 10, 'rate': 20, 'num_rounds': 300}
+}
+# The results that must be the same as the baseline's, since the scenarios
+# are seeded.
+RESULT_FIELDS = ['total_people', 'people_completed', 'max_time', 'min_time',
+                 'avg_time']
+# How much slower or bigger than the baseline a run may be before it is
+# reported as a regression.
+TOLERANCE = 0.1
+
+
+def make_config(num_floors: int, num_elevators: int, capacity: int,
+                rate: int, name: str, seed: int) -> Dict[str, Any]:
+    """Return the configuration of a headless simulation with <rate> random
+    arrivals per round and the moving algorithm called <name>, both seeded
+    with <seed>.
+    """
+    algorithm = ALGORITHMS[name]
+    if algorithm is algorithms.RandomAlgorithm:
+        moving_algorithm = algorithm(seed)
+    else:
+        moving_algorithm = algorithm()
+    return {
+        'num_floors': num_floors,
+        'num_elevators': num_elevators,
+        'elevator_capacity': capacity,
+        'num_people_per_round': rate,
+        'arrival_generator': algorithms.RandomArrivals(num_floors, rate,
+                                                       seed),
+        'moving_algorithm': moving_algorithm,
+        'visualize': False
+    }
+
+
+def compare_algorithms(num_floors: int, num_elevators: int, capacity: int,
+                       rate: int, num_rounds: int, seed: int = 0,
+                       names: Optional[List[str]] = None
+                       ) -> Dict[str, Dict[str, Any]]:
+    """Run the same headless scenario with each moving algorithm in <names>
+    (all of them by default), and return each algorithm's statistics.
+
+    Besides the usual statistics, each result has the wall time of the run in
+    seconds and the 95th percentile wait time.
+    """
+    results = {}
+    for name in names or sorted(ALGORITHMS):
+        sim = Simulation(make_config(num_floors, num_elevators, capacity,
+                                     rate, name, seed))
+        start = time.perf_counter()
+        stats = dict(sim.run(num_rounds))
+        stats['seconds'] = time.perf_counter() - start
+        stats['p95_time'] = sim.live_stats()['p95']
+        results[name] = stats
+    return results
+
+
+def format_comparison(results: Dict[str, Dict[str, Any]]) -> str:
+    """Return the results of compare_algorithms as a table."""
+    lines = [f'{"algorithm":<16}{"completed":>10}{"avg":>10}{"p95":>8}'
+             f'{"max":>8}{"seconds":>10}']
+    for name, stats in results.items():
+        lines.append(f'{name:<16}{stats["people_completed"]:>10}'
+                     f'{stats["avg_time"]:>10.1f}{str(stats["p95_time"]):>8}'
+                     f'{stats["max_time"]:>8}{stats["seconds"]:>10.2f}')
+    return '\n'.join(lines)
+
+
+def memory_per_person(kind: str, count: int) -> float:
+    """Return the average number of bytes taken by each of <count> people
+    stored as <kind>.
+
+    <kind> is one of STORAGE_KINDS: 'sprite' for a list of entities.Person,
+    'record' for a list of records.PersonRecord, or 'pool' for a
+    records.PersonPool. At most SPRITE_SAMPLE sprites are created.
+
+    Precondition: count >= 1
+    """
+    if kind == 'sprite':
+        from entities import Person
+        count = min(count, SPRITE_SAMPLE)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        if kind == 'pool':
+            people = PersonPool()
+            for index in range(count):
+                people.add(1, 2, index)
+        else:
+            person_class = Person if kind == 'sprite' else PersonRecord
+            people = [person_class() for _ in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    if kind == 'sprite':
+        # Pygame allocates pixels outside of the Python heap, where
+        # tracemalloc can't see them. Sprites may share their images.
+        images = {id(person.image): person.image for person in people}
+        for image in images.values():
+            width, height = image.get_size()
+            used += width * height * image.get_bytesize()
+    return used / count
+
+
+def run_scenario(scenario: str, name: str, seed: int = 0, repeat: int = 1,
+                 measure_memory: bool = True) -> Dict[str, Any]:
+    """Run the benchmark <scenario> with the moving algorithm called <name>,
+    and return its statistics and measurements.
+
+    The run is timed <repeat> times and the fastest time is kept. If
+    <measure_memory> is True, it is then run once more under tracemalloc to
+    measure its peak memory use in bytes (None otherwise).
+
+    Precondition: repeat >= 1
+    """
+    spec = SCENARIOS[scenario]
+    arguments = (spec['num_floors'], spec['num_elevators'],
+                 spec['elevator_capacity'], spec['rate'], name, seed)
+    seconds = None
+    for _ in range(repeat):
+        sim = Simulation(make_config(*arguments))
+        start = time.perf_counter()
+        stats = dict(sim.run(spec['num_rounds']))
+        elapsed = time.perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            Simulation(make_config(*arguments)).run(spec['num_rounds'])
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    result = {field: stats[field] for field in RESULT_FIELDS}
+    result['seconds'] = seconds
+    result['rounds_per_second'] = spec['num_rounds'] / seconds
+    result['people_per_second'] = stats['total_people'] / seconds
+    result['peak_memory'] = peak_memory
+    return result
+
+
+def run_suite(scenarios: Optional[List[str]] = None,
+              names: Optional[List[str]] = None, seed: int = 0,
+              repeat: int = 1, measure_memory: bool = True
+              ) -> Dict[str, Dict[str, Any]]:
+    """Run each of <scenarios> with each of the moving algorithms in <names>
+    (all of both by default), and return the result of each run keyed by
+    'scenario/algorithm'.
+    """
+    results = {}
+    for scenario in scenarios or list(SCENARIOS):
+        for name in names or sorted(ALGORITHMS):
+            results[f'{scenario}/{name}'] = run_scenario(
+                scenario, name, seed, repeat, measure_memory)
+    return results
+
+
+def format_suite(results: Dict[str, Dict[str, Any]]) -> str:
+    """Return the results of run_suite as a table."""
+    lines = [f'{"run":<24}{"rounds/s":>12}{"people/s":>12}{"peak KiB":>10}'
+             f'{"avg wait":>10}']
+    for key, result in results.items():
+        memory = result['peak_memory']
+        memory = '-' if memory is None else f'{memory / 1024:.0f}'
+        lines.append(f'{key:<24}{result["rounds_per_second"]:>12.0f}'
+                     f'{result["people_per_second"]:>12.0f}{memory:>10}'
+                     f'{result["avg_time"]:>10.1f}')
+    return '\n'.join(lines)
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], filename: str) -> None:
+    """Save the results of run_suite to the JSON file <filename>."""
+    with open(filename, 'w') as baseline_file:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'results': results}, baseline_file, indent=2)
+
+
+def load_baseline(filename: str) -> Dict[str, Dict[str, Any]]:
+    """Return the results saved to the JSON file <filename> by
+    save_baseline.
+    """
+    with open(filename) as baseline_file:
+        return json.load(baseline_file)['results']
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]],
+                        baseline: Dict[str, Dict[str, Any]],
+                        tolerance: float = TOLERANCE
+                        ) -> Tuple[str, List[str]]:
+    """Compare the results of run_suite with those of a <baseline>.
+
+    Return a table of the change in speed and peak memory of every run in
+    both, and a description of each regression: a run that is more than
+    <tolerance> slower or bigger than in the baseline, or whose results
+    differ from the baseline's.
+    """
+    lines = [f'{"run":<24}{"rounds/s":>12}{"change":>9}{"peak":>9}']
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        old = baseline[key]
+        speed = result['rounds_per_second'] / old['rounds_per_second'] - 1
+        memory = ''
+        if result['peak_memory'] and old['peak_memory']:
+            growth = result['peak_memory'] / old['peak_memory'] - 1
+            memory = f'{growth:+.0%}'
+            if growth > tolerance:
+                regressions.append(f'{key}: peak memory {growth:+.0%}')
+        if speed < -tolerance:
+            regressions.append(f'{key}: rounds/s {speed:+.0%}')
+        changed = [field for field in RESULT_FIELDS
+                   if result[field] != old[field]]
+        if changed:
+            regressions.append(f'{key}: results changed '
+                               f'({", ".join(changed)})')
+        lines.append(f'{key:<24}{result["rounds_per_second"]:>12.0f}'
+                     f'{speed:>+9.0%}{memory:>9}')
+    return '\n'.join(lines), regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Print a comparison of the moving algorithms described by the command
+    line arguments <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Compare the elevator moving algorithms.')
+    parser.add_argument('--floors', type=int, default=100)
+    parser.add_argument('--elevators', type=int, default=8)
+    parser.add_argument('--capacity', type=int, default=10)
+    parser.add_argument('--rate', type=int, default=2,
+                        help='people arriving per round')
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--algorithm', nargs='+', default=None,
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('--memory', action='store_true',
+                        help='measure the memory per person instead')
+    parser.add_argument('--people', type=int, default=100000,
+                        help='people to create when measuring memory')
+    parser.add_argument('--suite', action='store_true',
+                        help='run the benchmark suite instead')
+    parser.add_argument('--scenario', nargs='+', default=None,
+                        choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs of each scenario')
+    parser.add_argument('--save', default=None,
+                        help='save the suite results as a JSON baseline')
+    parser.add_argument('--baseline', default=None,
+                        help='compare the suite results with a JSON '
+                             'baseline')
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        results = run_suite(args.scenario, args.algorithm, args.seed,
+                            args.repeat)
+        print(format_suite(results))
+        if args.save:
+            save_baseline(results, args.save)
+        if args.baseline:
+            table, regressions = compare_to_baseline(
+                results, load_baseline(args.baseline))
+            print()
+            print(table)
+            for regression in regressions:
+                print(f'REGRESSION {regression}')
+            if regressions:
+                raise SystemExit(1)
+        return
+
+    if args.memory:
+        print(f'{"storage":<10}{"bytes/person":>14}')
+        for kind in STORAGE_KINDS:
+            print(f'{kind:<10}{memory_per_person(kind, args.people):>14.1f}')
+        return
+
+    results = compare_algorithms(args.floors, args.elevators, args.capacity,
+                                 args.rate, args.rounds, args.seed,
+                                 args.algorithm)
+    print(format_comparison(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""CSC148 Assignment 1 - Campus Simulations
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs the headless simulations of every building on a campus,
+fed from a single campus trace (see traces.py), and reports the statistics
+of each building as well as of the campus as a whole.
+
+Buildings are described like the runs of a sweep: a dictionary with the
+number of floors and elevators, the elevator capacity, the name of a moving
+algorithm (one of sweep.ALGORITHMS) and optionally a seed for it.
+
+A campus can run in one of two ways:
+    - cooperatively, in one process: the trace is read once, one line at a
+      time, and every building is stepped one round at a time, so only the
+      arrivals of the current round are ever held in memory;
+    - across a pool of worker processes, one building per job: each worker
+      reads the trace one line at a time, as its building's rounds advance,
+      keeping only the lines of its own building, so the buildings run in
+      parallel and memory stays bounded however long the trace is, at the
+      cost of every worker reading the whole trace.
+
+Both ways give exactly the same statistics.
+
+Run this module from the command line, for example:
+
+    python campus.py buildings.json campus.csv --rounds 1000 --processes 4
+
+where buildings.json maps each building name to its description.
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import algorithms
+import traces
+from records import PersonRecord
+from running_stats import RunningStats
+from simulation import Simulation, report_stats
+from sweep import ALGORITHMS, imap_pool
+
+
+class BuildingArrivals(algorithms.ArrivalGenerator):
+    """Generate the arrivals handed to one building of a campus.
+
+    === Attributes ===
+    pending: the (start, target, start, target, ...) floors of the people
+             arriving in each round that hasn't been generated yet
+    """
+    pending: Dict[int, List[int]]
+
+    def __init__(self, max_floor: int,
+                 pending: Optional[Dict[int, List[int]]] = None) -> None:
+        """Initialize a new BuildingArrivals, with the arrivals <pending>
+        (none by default).
+        """
+        algorithms.ArrivalGenerator.__init__(self, max_floor, None)
+        self.pending = {} if pending is None else pending
+
+    def feed(self, round_num: int, floors: List[int]) -> None:
+        """Add the people described by <floors> to the arrivals of round
+        <round_num>.
+        """
+        self.pending.setdefault(round_num, []).extend(floors)
+
+    def generate(self, round_num: int) -> Dict[int, List[PersonRecord]]:
+        return self.make_arrivals(self.arrival_floors(round_num))
+
+    def arrival_floors(self, round_num: int) -> List[int]:
+        return self.pending.pop(round_num, [])
+
+
+class CampusTrace:
+    """A reader of a campus trace, which hands each line to the building it
+    belongs to as rounds advance.
+
+    The file is read once, one line at a time, and closed once it has been
+    read to the end (or by calling close).
+
+    Precondition: the lines of the file are sorted by round.
+
+    === Attributes ===
+    filename: the campus trace being read
+    """
+    filename: str
+    _lines: Any
+    _pending: Optional[Tuple[str, int, List[int]]]
+
+    def __init__(self, filename: str) -> None:
+        """Initialize a reader of <filename>, without reading any of it yet.
+        """
+        self.filename = filename
+        self._lines = traces.read_campus_trace(filename)
+        self._pending = None
+
+    def deliver(self, round_num: int,
+                buildings: Dict[str, BuildingArrivals]) -> None:
+        """Feed the arrivals of every round up to <round_num> to their
+        <buildings>.
+
+        Lines for buildings that aren't in <buildings> are skipped.
+        """
+        while self._advance() and self._pending[1] <= round_num:
+            building, line_round, floors = self._pending
+            if building in buildings:
+                buildings[building].feed(line_round, floors)
+            self._pending = None
+
+    def close(self) -> None:
+        """Close the file; no further arrivals will be delivered."""
+        if self._lines is not None:
+            self._lines.close()
+        self._lines = None
+        self._pending = None
+
+    def _advance(self) -> bool:
+        """Make sure the next unused line is pending, and return whether there
+        is one.
+        """
+        if self._pending is None and self._lines is not None:
+            self._pending = next(self._lines, None)
+            if self._pending is None:
+                self.close()
+        return self._pending is not None
+
+
+def make_simulation(building: Dict[str, Any],
+                    arrivals: BuildingArrivals) -> Simulation:
+    """Return a headless simulation of <building>, whose people arrive from
+    <arrivals>.
+    """
+    algorithm = ALGORITHMS[building['moving_algorithm']]
+    if algorithm is algorithms.RandomAlgorithm:
+        moving_algorithm = algorithm(building.get('seed', 0))
+    else:
+        moving_algorithm = algorithm()
+    return Simulation({
+        'num_floors': building['num_floors'],
+        'num_elevators': building['num_elevators'],
+        'elevator_capacity': building['elevator_capacity'],
+        'num_people_per_round': None,
+        'arrival_generator': arrivals,
+        'moving_algorithm': moving_algorithm,
+        'visualize': False
+    })
+
+
+def run_building(job: Tuple[str, Dict[str, Any], str, int]
+                 ) -> Tuple[str, Dict[str, Any], RunningStats]:
+    """Run one building of a campus in a worker process.
+
+    <job> is the building's name, its description, the campus trace its
+    arrivals are read from, and the number of rounds to run. The trace is
+    read as the rounds advance, so only the arrivals of the current round
+    are held in memory. Return the name, the statistics of the run and its
+    wait time statistics.
+    """
+    name, building, trace, num_rounds = job
+    stats, wait_stats = run_cooperative({name: building}, trace,
+                                        num_rounds)[name]
+    return name, stats, wait_stats
+
+
+def run_cooperative(buildings: Dict[str, Dict[str, Any]], trace: str,
+                    num_rounds: int
+                    ) -> Dict[str, Tuple[Dict[str, Any], RunningStats]]:
+    """Run <buildings> for <num_rounds> in this process, interleaving their
+    rounds, with their arrivals read from the campus trace <trace>.
+
+    Return the statistics and wait time statistics of each building.
+    """
+    arrivals = {name: BuildingArrivals(building['num_floors'])
+                for name, building in buildings.items()}
+    sims = {name: make_simulation(building, arrivals[name])
+            for name, building in buildings.items()}
+    reader = CampusTrace(trace)
+    try:
+        for round_num in range(num_rounds):
+            reader.deliver(round_num, arrivals)
+            for sim in sims.values():
+                sim.step()
+    finally:
+        reader.close()
+    return {name: (sim.statistics(), sim.wait_stats)
+            for name, sim in sims.items()}
+
+
+def run_pool(buildings: Dict[str, Dict[str, Any]], trace: str,
+             num_rounds: int, processes: Optional[int] = None
+             ) -> Dict[str, Tuple[Dict[str, Any], RunningStats]]:
+    """Run <buildings> for <num_rounds> across a pool of <processes>
+    workers (one per core if None), with their arrivals read from the campus
+    trace <trace>.
+
+    Return the statistics and wait time statistics of each building.
+    """
+    jobs = [(name, building, trace, num_rounds)
+            for name, building in buildings.items()]
+    results = {}
+    for name, stats, wait_stats in imap_pool(run_building, jobs, processes):
+        results[name] = (stats, wait_stats)
+    return results
+
+
+def campus_stats(results: Dict[str, Tuple[Dict[str, Any], RunningStats]]
+                 ) -> Dict[str, Any]:
+    """Return the statistics of the whole campus, given the <results> of
+    each of its buildings, as if the campus were a single building.
+    """
+    round_stat = {
+        'num_iterations': 0,
+        'total_people': 0,
+        'people_completed': 0
+    }
+    wait_stats = RunningStats()
+    for stats, building_wait_stats in results.values():
+        round_stat['num_iterations'] = max(round_stat['num_iterations'],
+                                           stats['num_iterations'])
+        round_stat['total_people'] += stats['total_people']
+        round_stat['people_completed'] += stats['people_completed']
+        wait_stats.merge(building_wait_stats)
+    return report_stats(round_stat, wait_stats)
+
+
+def run_campus(buildings: Dict[str, Dict[str, Any]], trace: str,
+               num_rounds: int, processes: Optional[int] = 1
+               ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Run every one of <buildings> for <num_rounds>, with their arrivals
+    read from the campus trace <trace>.
+
+    If <processes> is 1, the buildings run cooperatively in this process;
+    otherwise they run across a pool of <processes> workers (one per core if
+    None). Return the statistics of each building, and of the whole campus.
+    """
+    if processes == 1:
+        results = run_cooperative(buildings, trace, num_rounds)
+    else:
+        results = run_pool(buildings, trace, num_rounds, processes)
+    per_building = {name: results[name][0] for name in buildings}
+    return per_building, campus_stats(results)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the campus described by the command line arguments <argv>, and
+    print its statistics.
+    """
+    parser = argparse.ArgumentParser(
+        description='Run every building of a campus from one trace.')
+    parser.add_argument('buildings',
+                        help='JSON file mapping building names to their '
+                             'descriptions')
+    parser.add_argument('trace', help='campus trace CSV file')
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=1,
+                        help='worker processes (0 for one per core)')
+    args = parser.parse_args(argv)
+
+    with open(args.buildings) as buildings_file:
+        buildings = json.load(buildings_file)
+    per_building, campus = run_campus(buildings, args.trace, args.rounds,
+                                      args.processes or None)
+    print(f'{"building":<16}{"people":>10}{"completed":>10}{"avg":>10}'
+          f'{"max":>8}')
+    for name, stats in list(per_building.items()) + [('(campus)', campus)]:
+        print(f'{name:<16}{stats["total_people"]:>10}'
+              f'{stats["people_completed"]:>10}{stats["avg_time"]:>10.1f}'
+              f'{stats["max_time"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
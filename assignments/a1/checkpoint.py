@@ -0,0 +1,343 @@
+"""CSC148 Assignment 1 - Checkpoints
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module saves the state of a simulation between two rounds, and restores
+it into a new simulation, so that a long run can be resumed after it was
+interrupted, and so that many runs can branch off from one warmed-up state
+without simulating the rounds before it again.
+
+A Snapshot holds everything a simulation carries from one round to the next:
+its statistics so far, the floor and passengers of each elevator, the people
+waiting on each floor, and the state of its arrival generator and moving
+algorithm (see their getstate methods), such as the state of their random
+number generators or how far through a trace they have read.
+
+A checkpoint file holds one snapshot: an 8 byte header, the length of the
+small parts of the snapshot as an int64 and those parts pickled, and then
+the passengers and the waiting people as columns of int32s, as in a
+records.PersonPool. Only restore checkpoints you saved yourself, since
+reading one unpickles part of it.
+
+CheckpointWriter saves a snapshot every so many rounds: the snapshot is
+taken on the simulation's thread, and written by a background thread, so
+writing never holds up the simulation. Each checkpoint replaces the last one
+in a single step, so an interrupted run always leaves a whole checkpoint.
+"""
+from __future__ import annotations
+import copy
+import os
+import pickle
+import threading
+from array import array
+from collections import deque
+from typing import Any, BinaryIO, List, Optional, TYPE_CHECKING
+
+from records import PersonPool, PersonRecord
+from running_stats import RunningStats
+if TYPE_CHECKING:
+    from simulation import Simulation
+
+
+# The header that starts every checkpoint file.
+CHECKPOINT_MAGIC = b'ELVCKP1\x00'
+
+
+class Snapshot:
+    """The state of a simulation between two rounds.
+
+    === Attributes ===
+    num_iterations: the number of rounds run before the snapshot
+    total_people: the number of people who had arrived
+    people_completed: the number of people who had reached their target
+    simulated_rounds: the number of rounds actually simulated
+    wait_stats: the wait time statistics of the people who had completed
+    elevator_floors: the floor of each elevator
+    passenger_counts: the number of passengers on each elevator
+    passengers: the passengers of every elevator, elevator by elevator, in
+                the order they boarded
+    waiting_floors: the floors of the simulation's waiting dictionary
+    waiting_counts: the number of people waiting on each of waiting_floors
+    waiting: the people waiting on every floor, floor by floor, in the order
+             they arrived
+    generator_state: the state of the arrival generator
+    algorithm: the class name of the moving algorithm
+    algorithm_state: the state of the moving algorithm
+
+    === Representation invariants ===
+    len(elevator_floors) == len(passenger_counts)
+    sum(passenger_counts) == len(passengers)
+    len(waiting_floors) == len(waiting_counts)
+    sum(waiting_counts) == len(waiting)
+    """
+    num_iterations: int
+    total_people: int
+    people_completed: int
+    simulated_rounds: int
+    wait_stats: RunningStats
+    elevator_floors: List[int]
+    passenger_counts: List[int]
+    passengers: PersonPool
+    waiting_floors: List[int]
+    waiting_counts: List[int]
+    waiting: PersonPool
+    generator_state: Any
+    algorithm: str
+    algorithm_state: Any
+
+    def __init__(self, sim: Simulation) -> None:
+        """Initialize a snapshot of the current state of <sim>.
+
+        The snapshot shares nothing with <sim>, which can carry on running.
+        """
+        self.num_iterations = sim.round_stat['num_iterations']
+        self.total_people = sim.round_stat['total_people']
+        self.people_completed = sim.round_stat['people_completed']
+        self.simulated_rounds = sim._simulated_rounds
+        self.wait_stats = copy.deepcopy(sim.wait_stats)
+        self.elevator_floors = [elevator.floor for elevator in sim.elevators]
+        self.passenger_counts = [len(elevator.passengers)
+                                 for elevator in sim.elevators]
+        self.passengers = PersonPool()
+        for elevator in sim.elevators:
+            _add_people(self.passengers, elevator.passengers)
+        self.waiting_floors = list(sim.waiting)
+        self.waiting_counts = [len(sim.waiting[floor])
+                               for floor in self.waiting_floors]
+        self.waiting = PersonPool()
+        for floor in self.waiting_floors:
+            _add_people(self.waiting, sim.waiting[floor])
+        self.generator_state = sim.arrival_generator.getstate()
+        self.algorithm = type(sim.moving_algorithm).__name__
+        self.algorithm_state = sim.moving_algorithm.getstate()
+
+
+def _add_people(pool: PersonPool, people: List[PersonRecord]) -> None:
+    """Add <people> to the end of <pool>, in order."""
+    for person in people:
+        pool.add(person.start, person.target, person.arrival_round)
+
+
+def _take_people(sim: Simulation, pool: PersonPool, first: int,
+                 count: int) -> List[PersonRecord]:
+    """Return new people for <sim> copied from the <count> people of <pool>
+    from index <first> on.
+    """
+    people = []
+    for index in range(first, first + count):
+        person = sim.arrival_generator.make_person(pool.start[index],
+                                                   pool.target[index])
+        person.arrival_round = pool.arrival[index]
+        people.append(person)
+    return people
+
+
+def restore_snapshot(sim: Simulation, snapshot: Snapshot) -> None:
+    """Restore <snapshot> into <sim>, so that it carries on from the round
+    after the snapshot.
+
+    If the moving algorithm of <sim> is not of the class that was
+    snapshotted, the algorithm starts afresh from the snapshot's state of
+    the building instead, so different algorithms can be compared from the
+    same point. The snapshot itself is left unchanged, so it can be
+    restored any number of times.
+
+    Precondition: no rounds of <sim> have been run, it is headless, and it
+    was created with the same configuration as the snapshotted simulation,
+    except perhaps for its moving algorithm.
+    """
+    if len(sim.elevators) != len(snapshot.elevator_floors):
+        raise ValueError(f'the snapshot has {len(snapshot.elevator_floors)} '
+                         f'elevators, not {len(sim.elevators)}')
+    sim.round_stat['num_iterations'] = snapshot.num_iterations
+    sim.round_stat['total_people'] = snapshot.total_people
+    sim.round_stat['people_completed'] = snapshot.people_completed
+    sim._simulated_rounds = snapshot.simulated_rounds
+    sim.wait_stats = copy.deepcopy(snapshot.wait_stats)
+
+    first = 0
+    for elevator, floor, count in zip(sim.elevators,
+                                      snapshot.elevator_floors,
+                                      snapshot.passenger_counts):
+        elevator.floor = floor
+        people = _take_people(sim, snapshot.passengers, first, count)
+        elevator.board(people)
+        sim.waiting_people.update(people)
+        first += count
+
+    first = 0
+    for floor, count in zip(snapshot.waiting_floors,
+                            snapshot.waiting_counts):
+        people = _take_people(sim, snapshot.waiting, first, count)
+        sim.waiting[floor] = deque(people)
+        sim.waiting_people.update(people)
+        first += count
+
+    sim.arrival_generator.setstate(snapshot.generator_state)
+    if type(sim.moving_algorithm).__name__ == snapshot.algorithm:
+        sim.moving_algorithm.setstate(snapshot.algorithm_state)
+
+
+def write_snapshot(snapshot: Snapshot, filename: str) -> None:
+    """Save <snapshot> to the checkpoint file <filename>.
+
+    The checkpoint is written to a temporary file first, which then replaces
+    <filename>, so <filename> always holds a whole checkpoint.
+    """
+    small = {name: value for name, value in vars(snapshot).items()
+             if name not in ('passengers', 'waiting')}
+    blob = pickle.dumps(small, pickle.HIGHEST_PROTOCOL)
+    partial = filename + '.partial'
+    with open(partial, 'wb') as checkpoint:
+        checkpoint.write(CHECKPOINT_MAGIC)
+        array('q', [len(blob)]).tofile(checkpoint)
+        checkpoint.write(blob)
+        for pool in (snapshot.passengers, snapshot.waiting):
+            array('q', [len(pool)]).tofile(checkpoint)
+            for column in (pool.start, pool.target, pool.arrival):
+                column.tofile(checkpoint)
+    os.replace(partial, filename)
+
+
+def read_snapshot(filename: str) -> Snapshot:
+    """Return the snapshot saved to the checkpoint file <filename>."""
+    with open(filename, 'rb') as checkpoint:
+        if checkpoint.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f'{filename} is not a checkpoint')
+        snapshot = Snapshot.__new__(Snapshot)
+        length = _read_column(checkpoint, 'q', 1)[0]
+        vars(snapshot).update(pickle.loads(checkpoint.read(length)))
+        pools = []
+        for _ in range(2):
+            pool = PersonPool()
+            count = _read_column(checkpoint, 'q', 1)[0]
+            pool.start = _read_column(checkpoint, 'i', count)
+            pool.target = _read_column(checkpoint, 'i', count)
+            pool.arrival = _read_column(checkpoint, 'i', count)
+            pools.append(pool)
+    snapshot.passengers, snapshot.waiting = pools
+    return snapshot
+
+
+def _read_column(checkpoint: BinaryIO, typecode: str, count: int) -> array:
+    """Read an array of <count> values of <typecode> from <checkpoint>."""
+    column = array(typecode)
+    column.fromfile(checkpoint, count)
+    return column
+
+
+class CheckpointWriter:
+    """A writer of checkpoints of a simulation in a background thread.
+
+    Only the latest snapshot waiting to be written is kept: if a snapshot is
+    taken while the previous one is still waiting, the previous one is
+    skipped, since the newer one supersedes it.
+
+    === Attributes ===
+    filename: the checkpoint file written
+    every: the number of rounds between checkpoints
+    last_round: the num_iterations of the simulation when the last snapshot
+                was taken (or when writing started)
+    written: the number of checkpoints written so far
+    """
+    filename: str
+    every: int
+    last_round: int
+    written: int
+    # Guards the attributes below, and is notified when they change.
+    _changed: threading.Condition
+    _pending: Optional[Snapshot]
+    _busy: bool
+    _closed: bool
+    _thread: threading.Thread
+    # The first error the writer thread ran into, if any.
+    _error: Optional[BaseException]
+
+    def __init__(self, filename: str, every: int) -> None:
+        """Initialize a writer of checkpoints to <filename> every <every>
+        rounds, and start its thread.
+
+        Precondition: every >= 1
+        """
+        self.filename = filename
+        self.every = every
+        self.last_round = 0
+        self.written = 0
+        self._changed = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self._error = None
+        self._thread = threading.Thread(target=self._write_snapshots,
+                                        daemon=True)
+        self._thread.start()
+
+    def round_done(self, sim: Simulation) -> None:
+        """Take a snapshot of <sim> to be written if it has run at least
+        <every> rounds since the last one.
+        """
+        if sim.round_stat['num_iterations'] - self.last_round >= self.every:
+            self.save(Snapshot(sim))
+
+    def save(self, snapshot: Snapshot) -> None:
+        """Queue <snapshot> to be written, in place of any snapshot still
+        waiting.
+        """
+        self.last_round = snapshot.num_iterations
+        with self._changed:
+            self._pending = snapshot
+            self._changed.notify_all()
+
+    def flush(self) -> None:
+        """Wait until the queued snapshot has been written."""
+        with self._changed:
+            while self._pending is not None or self._busy:
+                self._changed.wait()
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        """Write the queued snapshot, and stop the writer thread."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write_snapshots(self) -> None:
+        """Write each queued snapshot until the writer is closed."""
+        while True:
+            with self._changed:
+                while self._pending is None and not self._closed:
+                    self._changed.wait()
+                snapshot = self._pending
+                if snapshot is None:
+                    return
+                self._pending = None
+                self._busy = True
+            try:
+                if self._error is None:
+                    write_snapshot(snapshot, self.filename)
+                    self.written += 1
+            except Exception as error:  # reported by flush and close
+                self._error = error
+            finally:
+                with self._changed:
+                    self._busy = False
+                    self._changed.notify_all()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['write_snapshot', 'read_snapshot'],
+        'extra-imports': ['copy', 'os', 'pickle', 'threading', 'array',
+                          'collections', 'records', 'running_stats',
+                          'simulation'],
+        'max-nested-blocks': 4,
+        'max-attributes': 15
+    })
@@ -0,0 +1,346 @@
+"""CSC148 Assignment 1 - Live Simulations
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs a headless simulation of a building live, from arrival
+events as they happen rather than from a trace read ahead of time.
+
+A LiveService runs one round of its simulation every tick of a timer, on an
+asyncio event loop. Arrivals are put on its queue by any number of feeds,
+each as the (start, target, start, target, ...) floors of one or more
+people, and join the simulation in the next round. People who start or
+want to go outside the building, or who want to stay on the floor they start
+on, are dropped as they are taken off the queue. After every round, the
+round's statistics are published to each subscriber's queue.
+
+Each round only takes a bounded number of people off the queue: the rest of
+a burst waits for the rounds after it, so however many people arrive at
+once, a round never takes much longer than any other and the timer keeps
+time. Subscribers that fall behind lose their oldest statistics rather than
+holding up the rounds.
+
+Two local feeds stand in for a live source of arrivals: replay_trace puts
+the lines of a CSV trace (see traces.py) on the queue at the times their
+rounds come up, and serve_arrivals accepts connections on a TCP socket and
+puts each line sent on it on the queue, in the same format as the lines of
+a CSV trace but without the round number.
+
+Run this module from the command line, for example:
+
+    python live.py --floors 5 --elevators 2 --tick 0.1 \\
+        --replay sample_arrivals.csv --rounds 20
+    python live.py --floors 20 --elevators 4 --port 8765
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import traces
+from campus import BuildingArrivals, make_simulation
+from running_stats import RunningStats
+from simulation import Simulation
+from sweep import ALGORITHMS
+
+
+# The most people taken off the queue in one round by default.
+MAX_PEOPLE_PER_ROUND = 1000
+# The most arrival events that can wait on the queue by default; feeds wait
+# for room once it is full.
+QUEUE_SIZE = 10000
+# The most statistics that can wait on a subscriber's queue by default.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class LiveService:
+    """A simulation of a building whose rounds are run by a timer, with the
+    arrivals put on its queue.
+
+    === Attributes ===
+    tick: the number of seconds between the starts of two rounds
+    max_people: the most people who join the simulation in one round
+    queue: the arrival events not taken into the simulation yet, each a list
+           of (start, target, start, target, ...) floors
+    round_times: the wall time of each round run so far, in microseconds
+    late_rounds: the number of rounds that started late, because the round
+                 before them took longer than a tick
+    rejected: the number of people dropped because their start or target
+              floor was not a floor of the building other than their start
+
+    === Representation invariants ===
+    tick > 0
+    max_people >= 1
+    """
+    tick: float
+    max_people: int
+    queue: asyncio.Queue
+    round_times: RunningStats
+    late_rounds: int
+    rejected: int
+    _sim: Simulation
+    _arrivals: BuildingArrivals
+    # The floors of the last event taken off the queue, and how many of them
+    # have joined the simulation; the event may have been too big to take in
+    # one round.
+    _carry: List[int]
+    _carried: int
+    _subscribers: List[asyncio.Queue]
+    _stopping: Optional[asyncio.Event]
+
+    def __init__(self, building: Dict[str, Any], tick: float,
+                 max_people: int = MAX_PEOPLE_PER_ROUND,
+                 queue_size: int = QUEUE_SIZE) -> None:
+        """Initialize a live service simulating <building>, described as in
+        campus.py, one round every <tick> seconds.
+
+        Precondition: tick > 0, max_people >= 1 and queue_size >= 1
+        """
+        self.tick = tick
+        self.max_people = max_people
+        self.queue = asyncio.Queue(queue_size)
+        self.round_times = RunningStats()
+        self.late_rounds = 0
+        self.rejected = 0
+        self._arrivals = BuildingArrivals(building['num_floors'])
+        self._sim = make_simulation(building, self._arrivals)
+        self._carry = []
+        self._carried = 0
+        self._subscribers = []
+        self._stopping = None
+
+    def subscribe(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE
+                  ) -> asyncio.Queue:
+        """Return a new queue on which the statistics of each round from now
+        on will be published.
+
+        Precondition: queue_size >= 1
+        """
+        subscriber = asyncio.Queue(queue_size)
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: asyncio.Queue) -> None:
+        """Stop publishing statistics to <subscriber>."""
+        self._subscribers.remove(subscriber)
+
+    def backlog(self) -> int:
+        """Return the number of arrival events waiting on the queue, counting
+        an event that was only partly taken.
+        """
+        partly_taken = self._carried < len(self._carry)
+        return self.queue.qsize() + (1 if partly_taken else 0)
+
+    def stop(self) -> None:
+        """Stop running rounds after the current one."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self, num_rounds: Optional[int] = None) -> Dict[str, Any]:
+        """Run a round every tick, <num_rounds> times or until stopped, and
+        return the statistics of the simulation.
+        """
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        rounds_run = 0
+        while not self._stopping.is_set() and \
+                (num_rounds is None or rounds_run < num_rounds):
+            self._run_round()
+            rounds_run += 1
+            deadline += self.tick
+            delay = deadline - loop.time()
+            if delay < 0:
+                # Start the next round now, and keep time from there rather
+                # than running rounds back to back to catch up.
+                self.late_rounds += 1
+                deadline = loop.time()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), max(delay, 0))
+            except asyncio.TimeoutError:
+                pass
+        self._stopping = None
+        return self._sim.statistics()
+
+    def _run_round(self) -> None:
+        """Take the next arrivals off the queue, run a round with them, and
+        publish its statistics.
+        """
+        start = time.perf_counter()
+        round_num = self._sim.round_stat['num_iterations']
+        floors = self._take_arrivals()
+        self._arrivals.feed(round_num, floors)
+        self._sim.step()
+        elapsed = time.perf_counter() - start
+        self.round_times.add(round(elapsed * 1e6))
+
+        stats = self._sim.statistics()
+        stats['arrived'] = len(floors) // 2
+        stats['backlog'] = self.backlog()
+        stats['round_seconds'] = elapsed
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()
+            subscriber.put_nowait(stats)
+
+    def _take_arrivals(self) -> List[int]:
+        """Return the floors of at most max_people people taken off the
+        queue, in the order they were put on it.
+        """
+        limit = 2 * self.max_people
+        floors = []
+        while len(floors) < limit:
+            if self._carried == len(self._carry):
+                if self.queue.empty():
+                    break
+                self._carry = self._check_people(self.queue.get_nowait())
+                self._carried = 0
+            end = min(len(self._carry),
+                      self._carried + limit - len(floors))
+            floors.extend(self._carry[self._carried:end])
+            self._carried = end
+        return floors
+
+    def _check_people(self, event: List[int]) -> List[int]:
+        """Return the floors of the people of <event> who start and want to
+        go to different floors of the building, counting the others as
+        rejected.
+
+        A floor left over at the end of <event> is ignored.
+        """
+        num_floors = self._arrivals.max_floor
+        floors = []
+        for i in range(0, len(event) - 1, 2):
+            start, target = event[i], event[i + 1]
+            if 1 <= start <= num_floors and 1 <= target <= num_floors \
+                    and start != target:
+                floors.append(start)
+                floors.append(target)
+            else:
+                self.rejected += 1
+        return floors
+
+
+async def replay_trace(service: LiveService, filename: str) -> None:
+    """Put the arrivals of each line of the CSV trace <filename> on the
+    queue of <service> when its round comes up, as if they were happening
+    live, counting from now.
+
+    Precondition: the lines of <filename> are sorted by round.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for round_num, floors in traces.read_csv_trace(filename):
+        delay = started + round_num * service.tick - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await service.queue.put(floors)
+
+
+async def serve_arrivals(service: LiveService, host: str = '127.0.0.1',
+                         port: int = 0) -> asyncio.AbstractServer:
+    """Start accepting connections on <host> and <port> (any free port if
+    0), and put each line sent on them on the queue of <service>, and
+    return the server.
+
+    Each line is the (start, target, start, target, ...) floors of the
+    people arriving, separated by commas. Lines that aren't all whole
+    numbers are skipped, and people whose floors aren't in the building are
+    dropped when they are taken off the queue (see LiveService.rejected).
+    """
+    async def receive(reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """Put each line sent on one connection on the queue."""
+        try:
+            async for line in reader:
+                try:
+                    floors = [int(floor) for floor in line.split(b',')]
+                except ValueError:
+                    continue
+                await service.queue.put(floors)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(receive, host, port)
+
+
+async def _print_stats(subscriber: asyncio.Queue) -> None:
+    """Print the statistics published to <subscriber> as they come."""
+    while True:
+        stats = await subscriber.get()
+        print(f'round {stats["num_iterations"]:>6}  '
+              f'arrived {stats["arrived"]:>5}  '
+              f'backlog {stats["backlog"]:>5}  '
+              f'completed {stats["people_completed"]:>7}  '
+              f'avg {stats["avg_time"]:>8.1f}  '
+              f'{stats["round_seconds"] * 1e3:>6.2f} ms')
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the live service described by the command line arguments
+    <args>.
+    """
+    service = LiveService({
+        'num_floors': args.floors,
+        'num_elevators': args.elevators,
+        'elevator_capacity': args.capacity,
+        'moving_algorithm': args.algorithm
+    }, args.tick, args.max_people)
+    printer = asyncio.create_task(_print_stats(service.subscribe()))
+    feed = None
+    server = None
+    if args.replay:
+        feed = asyncio.create_task(replay_trace(service, args.replay))
+    else:
+        server = await serve_arrivals(service, args.host, args.port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f'listening for arrivals on {host}:{port}')
+    try:
+        await service.run(args.rounds)
+    finally:
+        for task in (printer, feed):
+            if task is not None:
+                task.cancel()
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    print(f'round time (us): median {service.round_times.percentile(50)}, '
+          f'p99 {service.round_times.percentile(99)}, '
+          f'max {service.round_times.maximum}; '
+          f'{service.late_rounds} rounds started late')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the live service described by the command line arguments <argv>,
+    printing the statistics of each round.
+    """
+    parser = argparse.ArgumentParser(
+        description='Run a simulation live from a feed of arrivals.')
+    parser.add_argument('--floors', type=int, default=5)
+    parser.add_argument('--elevators', type=int, default=2)
+    parser.add_argument('--capacity', type=int, default=3)
+    parser.add_argument('--algorithm', default='look',
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('--tick', type=float, default=1.0,
+                        help='seconds per round')
+    parser.add_argument('--max-people', type=int,
+                        default=MAX_PEOPLE_PER_ROUND,
+                        help='most people joining in one round')
+    parser.add_argument('--rounds', type=int, default=None,
+                        help='rounds to run (forever by default)')
+    parser.add_argument('--replay', default=None,
+                        help='CSV trace to replay instead of listening')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
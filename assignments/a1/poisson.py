@@ -0,0 +1,191 @@
+"""CSC148 Assignment 1 - Poisson Arrivals
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains arrival generators whose people arrive at random times,
+at rates that can vary from floor to floor and from round to round, like the
+morning rush at the ground floor of an office building.
+
+The number of people arriving on each floor in each round is Poisson
+distributed. Arrivals are sampled with NumPy for a whole block of rounds at
+once and then handed out round by round from a buffer, so the cost of
+generating them is spread over the block.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import algorithms
+from records import PersonPool, PersonRecord
+
+
+# The number of rounds sampled at once by default.
+BLOCK_SIZE = 256
+
+
+class ProfileArrivals(algorithms.ArrivalGenerator):
+    """Generate people arriving at random, following a profile of rates.
+
+    In round r, the number of people arriving on floor f is Poisson
+    distributed with mean rates[r % len(rates)][f - 1], so the profile
+    repeats every len(rates) rounds. Each person goes to one of the other
+    floors, chosen uniformly at random.
+
+    Each block of rounds is sampled from its own random stream, derived from
+    the seed and the block's position, so the arrivals of a round never
+    depend on which rounds were generated before it.
+
+    === Attributes ===
+    rates: the mean number of people arriving on each floor (columns) in
+           each round of the profile (rows)
+    block_size: the number of rounds sampled at once
+    seed: the seed of every block's random stream
+
+    === Representation invariants ===
+    rates.shape == (len(rates), max_floor) and len(rates) >= 1
+    all rates are >= 0
+    block_size >= 1
+    """
+    rates: np.ndarray
+    block_size: int
+    seed: int
+    # The first round of the buffered block, the start and target floors of
+    # the people arriving in it ordered by round, and where each of its
+    # rounds starts in them.
+    _block_start: Optional[int]
+    _starts: np.ndarray
+    _targets: np.ndarray
+    _offsets: np.ndarray
+
+    def __init__(self, max_floor: int, rates: Sequence[Sequence[float]],
+                 seed: Optional[int] = None,
+                 block_size: int = BLOCK_SIZE) -> None:
+        """Initialize a new ProfileArrivals with the given profile of
+        <rates>.
+
+        If <seed> is None, a fresh seed is drawn from the operating system.
+
+        Precondition: <rates> satisfies the representation invariants.
+        """
+        algorithms.ArrivalGenerator.__init__(self, max_floor, None)
+        self.rates = np.asarray(rates, dtype=float).reshape(-1, max_floor)
+        self.block_size = block_size
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self._block_start = None
+        self._starts = self._targets = np.zeros(0, dtype=np.intc)
+        self._offsets = np.zeros(1, dtype=np.intp)
+
+    def next_arrival_round(self, round_num: int) -> Optional[int]:
+        if not self.rates.any():
+            return None
+        while True:
+            self._load_block(round_num)
+            counts = np.diff(self._offsets)
+            first = round_num - self._block_start
+            later = np.flatnonzero(counts[first:])
+            if len(later) > 0:
+                return round_num + int(later[0])
+            round_num = self._block_start + self.block_size
+
+    def generate(self, round_num: int) -> Dict[int, List[PersonRecord]]:
+        return self.make_arrivals(self.arrival_floors(round_num))
+
+    def arrival_floors(self, round_num: int) -> List[int]:
+        starts, targets = self.arrival_arrays(round_num)
+        return np.column_stack((starts, targets)).ravel().tolist()
+
+    def generate_pool(self, round_num: int) -> PersonPool:
+        starts, targets = self.arrival_arrays(round_num)
+        pool = PersonPool()
+        pool.start.frombytes(starts.tobytes())
+        pool.target.frombytes(targets.tobytes())
+        pool.arrival.frombytes(
+            np.full(len(starts), round_num, dtype=np.intc).tobytes())
+        return pool
+
+    def arrival_arrays(self, round_num: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the start and target floors of the people arriving at
+        <round_num>, ordered by start floor.
+        """
+        self._load_block(round_num)
+        index = round_num - self._block_start
+        first, last = self._offsets[index], self._offsets[index + 1]
+        return self._starts[first:last], self._targets[first:last]
+
+    def _load_block(self, round_num: int) -> None:
+        """Make sure the buffer holds the block of rounds containing
+        <round_num>.
+        """
+        block = round_num // self.block_size
+        block_start = block * self.block_size
+        if block_start == self._block_start:
+            return
+        rng = np.random.default_rng([self.seed, block])
+        rows = np.arange(block_start, block_start + self.block_size) % \
+            len(self.rates)
+        counts = rng.poisson(self.rates[rows])
+        floors = np.arange(1, self.max_floor + 1, dtype=np.intc)
+        starts = np.repeat(np.tile(floors, self.block_size), counts.ravel())
+        # Draw each target from the other max_floor - 1 floors by skipping
+        # over the start floor.
+        targets = rng.integers(1, self.max_floor, size=len(starts),
+                               dtype=np.intc)
+        targets += targets >= starts
+        self._block_start = block_start
+        self._starts = starts
+        self._targets = targets
+        self._offsets = np.concatenate(([0], np.cumsum(counts.sum(axis=1))))
+
+
+class PoissonArrivals(ProfileArrivals):
+    """Generate people arriving at random at a constant average rate.
+
+    On average <rate> people arrive in each round, spread evenly over the
+    floors.
+    """
+
+    def __init__(self, max_floor: int, rate: float,
+                 seed: Optional[int] = None,
+                 block_size: int = BLOCK_SIZE) -> None:
+        """Initialize a new PoissonArrivals with on average <rate> people
+        arriving each round.
+
+        Precondition: rate >= 0
+        """
+        ProfileArrivals.__init__(self, max_floor,
+                                 np.full((1, max_floor), rate / max_floor),
+                                 seed, block_size)
+
+
+def morning_rush(max_floor: int, period: int, base_rate: float,
+                 peak_rate: float, peak_round: int,
+                 width: float) -> np.ndarray:
+    """Return a profile of rates for ProfileArrivals that repeats every
+    <period> rounds.
+
+    On average <base_rate> people arrive each round, spread evenly over the
+    floors. On top of that, people arrive at the ground floor at a rate that
+    peaks at <peak_rate> in round <peak_round>, and falls off like a bell
+    curve <width> rounds wide.
+
+    Precondition: period >= 1, base_rate >= 0, peak_rate >= 0, width > 0
+    """
+    rates = np.full((period, max_floor), base_rate / max_floor)
+    rounds = np.arange(period)
+    rates[:, 0] += peak_rate * np.exp(
+        -0.5 * ((rounds - peak_round) / width) ** 2)
+    return rates
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'algorithms', 'records'],
+        'max-nested-blocks': 4,
+        'max-attributes': 12
+    })
@@ -0,0 +1,101 @@
+"""CSC148 Assignment 1 - Profiling
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains StageProfiler, which records how long each stage of a
+simulation round takes. Use Simulation.enable_profiling to attach one to a
+simulation; simulations without a profiler run exactly as before.
+
+The recorded times can be printed as a summary table, or written as a Chrome
+trace file that can be opened in chrome://tracing or https://ui.perfetto.dev.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StageProfiler:
+    """A recorder of the wall time and number of calls of named stages.
+
+    === Attributes ===
+    calls: the number of calls recorded for each stage
+    total: the total wall time in seconds recorded for each stage
+    longest: the longest single call in seconds recorded for each stage
+    events: the (stage, start, duration) of every recorded call, in seconds
+            since this profiler was created, or None if not tracing
+    """
+    calls: Dict[str, int]
+    total: Dict[str, float]
+    longest: Dict[str, float]
+    events: Optional[List[tuple]]
+    _origin: float
+
+    def __init__(self, trace: bool = True) -> None:
+        """Initialize a new profiler with nothing recorded.
+
+        If <trace> is False, only the totals are kept, and no Chrome trace
+        can be written.
+        """
+        self.calls = {}
+        self.total = {}
+        self.longest = {}
+        self.events = [] if trace else None
+        self._origin = time.perf_counter()
+
+    def record(self, stage: str, start: float, duration: float) -> None:
+        """Record a call of <stage> that started at perf_counter time <start>
+        and took <duration> seconds.
+        """
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.total[stage] = self.total.get(stage, 0.0) + duration
+        if duration > self.longest.get(stage, 0.0):
+            self.longest[stage] = duration
+        if self.events is not None:
+            self.events.append((stage, start - self._origin, duration))
+
+    def call(self, stage: str, function: Callable, *args: Any) -> Any:
+        """Call <function> with <args>, record the call as a call of
+        <stage>, and return what <function> returned.
+        """
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.record(stage, start, time.perf_counter() - start)
+
+    def summary(self) -> str:
+        """Return a table of the recorded stages, slowest first."""
+        lines = [f'{"stage":<40}{"calls":>10}{"total ms":>12}'
+                 f'{"mean us":>12}{"max us":>12}']
+        for stage in sorted(self.total, key=self.total.get, reverse=True):
+            calls = self.calls[stage]
+            total = self.total[stage]
+            lines.append(f'{stage:<40}{calls:>10}{total * 1e3:>12.2f}'
+                         f'{total / calls * 1e6:>12.1f}'
+                         f'{self.longest[stage] * 1e6:>12.1f}')
+        return '\n'.join(lines)
+
+    def write_chrome_trace(self, filename: str) -> None:
+        """Write the recorded calls to <filename> in the Chrome trace event
+        format.
+
+        Precondition: this profiler is tracing.
+        """
+        trace_events = [{'name': stage, 'ph': 'X', 'pid': 0, 'tid': 0,
+                         'ts': start * 1e6, 'dur': duration * 1e6}
+                        for stage, start, duration in self.events]
+        with open(filename, 'w') as trace_file:
+            json.dump({'traceEvents': trace_events,
+                       'displayTimeUnit': 'ms'}, trace_file)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['write_chrome_trace'],
+        'extra-imports': ['json', 'time'],
+        'max-nested-blocks': 4
+    })
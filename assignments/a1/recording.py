@@ -0,0 +1,177 @@
+"""CSC148 Assignment 1 - Recording
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains FrameRecorder, which saves the frames drawn by a
+Visualizer so that a run can be reviewed after the fact, for example after
+running it offscreen on a server without a display.
+
+Frames are copied on the simulation thread and handed to a background writer
+thread through a bounded queue, so compressing and writing them overlaps
+with the simulation. When the writer falls behind and the queue is full,
+capturing a frame waits for room, so every frame is saved. A recorder can
+instead be asked to drop frames when the queue is full, counting them, so
+that capturing never waits for the disk.
+
+A recording is either a directory of PNG images (frame_000000.png,
+frame_000001.png, ...), or a single raw file, for any path ending in '.raw':
+an 8 byte header, the frame width and height as int32s in native byte order,
+and then the RGB pixels of each frame, one after the other.
+"""
+import os
+import queue
+import threading
+from array import array
+from typing import Iterator, Optional, Tuple
+
+import pygame
+
+
+# The header that starts every raw recording.
+RAW_MAGIC = b'ELVFRM1\x00'
+# The most frames that can wait to be written by default; once this many
+# are waiting, capturing waits for room, or drops the frame if the recorder
+# drops frames.
+RECORD_QUEUE_SIZE = 16
+
+
+class FrameRecorder:
+    """A writer of frames to disk in a background thread.
+
+    === Attributes ===
+    path: the directory or raw file the frames are written to
+    size: the (width, height) of every frame
+    drop_frames: whether to drop frames rather than wait when the queue is
+                 full
+    captured: the number of frames captured so far, including dropped ones
+    dropped: the number of frames dropped because the queue was full
+    """
+    path: str
+    size: Tuple[int, int]
+    drop_frames: bool
+    captured: int
+    dropped: int
+    # Frames waiting to be written, as (frame number, RGB bytes), and None
+    # once the recorder is closed.
+    _queue: queue.Queue
+    _thread: threading.Thread
+    _raw: Optional[object]
+    # The first error the writer thread ran into, if any.
+    _error: Optional[BaseException]
+
+    def __init__(self, path: str, size: Tuple[int, int],
+                 queue_size: int = RECORD_QUEUE_SIZE,
+                 drop_frames: bool = False) -> None:
+        """Initialize a recorder of frames of <size> to <path>, and start
+        its writer thread.
+
+        Precondition: queue_size >= 1
+        """
+        self.path = path
+        self.size = size
+        self.drop_frames = drop_frames
+        self.captured = 0
+        self.dropped = 0
+        self._error = None
+        if path.endswith('.raw'):
+            self._raw = open(path, 'wb')
+            self._raw.write(RAW_MAGIC)
+            array('i', size).tofile(self._raw)
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._raw = None
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._write_frames,
+                                         daemon=True)
+        self._thread.start()
+
+    def capture(self, surface: pygame.Surface) -> bool:
+        """Queue a copy of <surface> to be written, and return whether it was
+        queued rather than dropped.
+
+        If the queue is full, wait for room, unless dropping frames.
+
+        Precondition: <surface> has this recorder's size.
+        """
+        frame = (self.captured, pygame.image.tobytes(surface, 'RGB'))
+        self.captured += 1
+        if not self.drop_frames:
+            self._queue.put(frame)
+            return True
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self) -> None:
+        """Wait until every queued frame has been written."""
+        self._queue.join()
+        if self._raw is not None:
+            self._raw.flush()
+        if self._error is not None:
+            raise self._error
+
+    def close(self) -> None:
+        """Write the queued frames, and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._raw is not None:
+            self._raw.close()
+        if self._error is not None:
+            raise self._error
+
+    def _write_frames(self) -> None:
+        """Write the queued frames until the recorder is closed."""
+        while True:
+            frame = self._queue.get()
+            try:
+                if frame is None:
+                    return
+                if self._error is None:
+                    self._write(*frame)
+            except Exception as error:  # reported by flush and close
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _write(self, number: int, pixels: bytes) -> None:
+        """Write frame <number>, whose RGB pixels are <pixels>."""
+        if self._raw is not None:
+            self._raw.write(pixels)
+        else:
+            image = pygame.image.frombuffer(pixels, self.size, 'RGB')
+            pygame.image.save(image, os.path.join(self.path,
+                                                  f'frame_{number:06}.png'))
+
+
+def read_raw_frames(filename: str) -> Iterator[Tuple[Tuple[int, int], bytes]]:
+    """Yield the (width, height) and RGB pixels of each frame of the raw
+    recording <filename>.
+    """
+    with open(filename, 'rb') as raw:
+        if raw.read(len(RAW_MAGIC)) != RAW_MAGIC:
+            raise ValueError(f'{filename} is not a raw recording')
+        size = array('i')
+        size.fromfile(raw, 2)
+        width, height = size
+        frame_size = width * height * 3
+        while True:
+            pixels = raw.read(frame_size)
+            if len(pixels) < frame_size:
+                return
+            yield (width, height), pixels
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['__init__', 'read_raw_frames'],
+        'extra-imports': ['os', 'queue', 'threading', 'array', 'pygame'],
+        'generated-members': 'pygame.*',
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,312 @@
+"""CSC148 Assignment 1 - Plain Records
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains the plain, sprite-free versions of the two "basic"
+entities in this simulation: people and elevators.
+
+Unlike the classes in entities.py, nothing here depends on Pygame, so a
+simulation that is not being visualized can create and move millions of
+these records without ever importing Pygame or loading an image. The sprite
+classes in entities.py inherit all of their simulation behaviour from here.
+
+PersonPool stores many people even more compactly, as three columns of
+machine integers rather than one object per person.
+"""
+from __future__ import annotations
+from array import array
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+
+class PassengerList:
+    """The passengers of an elevator, in the order they boarded, which also
+    keeps them grouped by target floor.
+
+    A PassengerList can be iterated over, indexed and compared with a list
+    like a list of its people, but only changed by append, extend, remove,
+    clear and take_target. Each of these takes time proportional to the
+    number of people added or removed, and indexing takes time proportional
+    to the index.
+
+    Preconditions: a person is in the list at most once, and their target
+    doesn't change while they are in it.
+    """
+    __slots__ = ('_order', '_by_target')
+    # The people in this list, in order, as the keys of a dictionary, so
+    # that any of them can be removed in O(1) time.
+    _order: Dict[PersonRecord, None]
+    # The people in this list grouped by target floor, each group in list
+    # order.
+    _by_target: Dict[int, List[PersonRecord]]
+
+    def __init__(self, people: Iterable[PersonRecord] = ()) -> None:
+        """Initialize a list of <people>."""
+        self._order = {}
+        self._by_target = {}
+        self.extend(people)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[PersonRecord]:
+        return iter(self._order)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, int) and index >= 0:
+            for person in itertools.islice(self._order, index, None):
+                return person
+            raise IndexError('passenger index out of range')
+        return list(self._order)[index]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, PassengerList)):
+            return list(self._order) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'PassengerList({list(self._order)!r})'
+
+    def __reduce__(self) -> tuple:
+        return PassengerList, (list(self._order),)
+
+    def append(self, person: PersonRecord) -> None:
+        """Add <person> to the end of this list."""
+        self._order[person] = None
+        group = self._by_target.get(person.target)
+        if group is None:
+            self._by_target[person.target] = [person]
+        else:
+            group.append(person)
+
+    def extend(self, people: Iterable[PersonRecord]) -> None:
+        """Add <people> to the end of this list, in order."""
+        for person in people:
+            self.append(person)
+
+    def remove(self, person: PersonRecord) -> None:
+        """Remove <person> from this list.
+
+        Takes time proportional to the number of people with the same
+        target.
+        """
+        del self._order[person]
+        group = self._by_target[person.target]
+        group.remove(person)
+        if not group:
+            del self._by_target[person.target]
+
+    def clear(self) -> None:
+        """Remove everybody from this list."""
+        self._order.clear()
+        self._by_target.clear()
+
+    def take_target(self, floor: int) -> List[PersonRecord]:
+        """Remove and return the people whose target is <floor>, in list
+        order.
+        """
+        leaving = self._by_target.pop(floor, None)
+        if leaving is None:
+            return []
+        for person in leaving:
+            del self._order[person]
+        return leaving
+
+
+class ElevatorRecord:
+    """A plain elevator in the elevator simulation.
+
+    === Attributes ===
+    passengers: A list of the people currently on this elevator, in the
+                order they boarded, grouped by target floor so that unload
+                takes only the people getting off (see PassengerList)
+    floor: the floor this elevator is currently on
+    capacity: the maximum number of people this elevator can hold
+
+    === Representation invariants ===
+    floor >= 1
+    capacity >= 1
+    len(passengers) <= capacity
+    """
+    __slots__ = ('_passengers', 'floor', 'capacity')
+    _passengers: PassengerList
+    floor: int
+    capacity: int
+
+    def __init__(self,
+                 person: List[PersonRecord],
+                 capacity: int) -> None:
+        self._passengers = PassengerList()
+        self.floor = 1
+        self.capacity = capacity
+        self.board(person)
+
+    @property
+    def passengers(self) -> PassengerList:
+        """The people currently on this elevator."""
+        return self._passengers
+
+    @passengers.setter
+    def passengers(self, people: Iterable[PersonRecord]) -> None:
+        self._passengers = PassengerList(people)
+
+    def board(self, people: Iterable[PersonRecord]) -> None:
+        """Add <people> to the passengers of this elevator.
+
+        Precondition: there is room for all of <people>.
+        """
+        self._passengers.extend(people)
+
+    def unload(self) -> List[PersonRecord]:
+        """Remove and return the passengers whose target is the floor this
+        elevator is on, in the order they boarded.
+        """
+        return self._passengers.take_target(self.floor)
+
+    def is_full(self) -> bool:
+        """check whether the elevator is full or not"""
+        return len(self.passengers) >= self.capacity
+
+    def is_empty(self) -> bool:
+        """check whether the elevator is empty or not"""
+        return len(self.passengers) == 0
+
+    def fullness(self) -> float:
+        """return the fullness of the elevator"""
+        return float(len(self.passengers) / self.capacity)
+
+
+class PersonRecord:
+    """A plain person in the elevator simulation.
+
+    === Attributes ===
+    start: the floor this person started on
+    target: the floor this person wants to go to
+    wait_time: the number of rounds this person has been waiting
+    arrival_round: the round this person arrived in the simulation
+
+    === Representation invariants ===
+    start >= 1
+    target >= 1
+    wait_time >= 0
+    arrival_round >= 0
+    """
+    __slots__ = ('start', 'target', 'wait_time', 'arrival_round')
+    start: int
+    target: int
+    wait_time: int
+    arrival_round: int
+
+    def __init__(self) -> None:
+        self.start = 1
+        self.target = 1
+        self.wait_time = 0
+        self.arrival_round = 0
+
+    def get_start(self, start: int) -> None:
+        """set the start floor"""
+        self.start = start
+
+    def get_target(self, target: int) -> None:
+        """set the target floor"""
+        self.target = target
+
+    def waited(self) -> None:
+        """make those people wait"""
+        self.wait_time += 1
+
+    def waited_until(self, round_num: int) -> None:
+        """set the wait time to the rounds since arriving, up to <round_num>"""
+        self.wait_time = round_num - self.arrival_round
+
+    def get_anger_level(self) -> int:
+        """Return this person's anger level.
+
+        A person's anger level is based on how long they have been waiting
+        before reaching their target floor.
+            - Level 0: waiting 0-2 rounds
+            - Level 1: waiting 3-4 rounds
+            - Level 2: waiting 5-6 rounds
+            - Level 3: waiting 7-8 rounds
+            - Level 4: waiting >= 9 rounds
+        """
+        if self.wait_time == 0:
+            return 0
+        elif self.wait_time >= 9:
+            return 4
+        else:
+            return (self.wait_time - 1) // 2
+
+
+class PersonPool:
+    """A compact store of people, as columns of 32-bit integers.
+
+    Person i starts on floor start[i], wants to go to floor target[i] and
+    arrived in round arrival[i]. Each person takes 12 bytes, and the columns
+    support the buffer protocol, so they can be shared with NumPy without
+    copying (e.g. numpy.frombuffer(pool.start, dtype=numpy.intc)).
+
+    === Attributes ===
+    start: the start floor of each person
+    target: the target floor of each person
+    arrival: the round each person arrived in
+
+    === Representation invariants ===
+    len(start) == len(target) == len(arrival)
+    """
+    __slots__ = ('start', 'target', 'arrival')
+    start: array
+    target: array
+    arrival: array
+
+    def __init__(self) -> None:
+        """Initialize an empty pool."""
+        self.start = array('i')
+        self.target = array('i')
+        self.arrival = array('i')
+
+    def __len__(self) -> int:
+        """Return the number of people in this pool."""
+        return len(self.start)
+
+    def add(self, start: int, target: int, arrival_round: int) -> None:
+        """Add a person going from <start> to <target> who arrived in
+        <arrival_round>.
+        """
+        self.start.append(start)
+        self.target.append(target)
+        self.arrival.append(arrival_round)
+
+    def add_floors(self, floors: Sequence[int], arrival_round: int) -> None:
+        """Add the people described by <floors>, who all arrived in
+        <arrival_round>.
+
+        <floors> lists the start and target floor of each person in turn:
+        (start, target, start, target, ...).
+        """
+        count = len(floors) // 2
+        self.start.extend(floors[0:2 * count:2])
+        self.target.extend(floors[1:2 * count:2])
+        self.arrival.extend([arrival_round] * count)
+
+    def person(self, index: int) -> PersonRecord:
+        """Return person <index> of this pool as a PersonRecord."""
+        person = PersonRecord()
+        person.get_start(self.start[index])
+        person.get_target(self.target[index])
+        person.arrival_round = self.arrival[index]
+        return person
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['array', 'itertools'],
+        'max-nested-blocks': 4,
+        'max-attributes': 12,
+        'disable': ['R0201']
+    })
@@ -0,0 +1,143 @@
+"""CSC148 Assignment 1 - Running Statistics
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains RunningStats, an online accumulator for the wait times
+of the people who complete their rides in a simulation.
+
+Values are folded in one at a time (or one repeated value at a time), so the
+count, minimum, maximum, mean and variance are always up to date and can be
+read in the middle of a run without scanning any history. Wait times are
+whole numbers of rounds, so percentiles are answered exactly from a
+histogram of the distinct values seen, whose size depends on the longest
+wait rather than on the number of people. Statistics gathered separately,
+for example in different processes, can be merged.
+"""
+from __future__ import annotations
+import math
+from typing import Dict, Optional
+
+
+class RunningStats:
+    """Online statistics of a stream of non-negative integer values.
+
+    === Attributes ===
+    count: the number of values added so far
+    total: the sum of the values added so far
+    minimum: the smallest value added so far, or None if there are none
+    maximum: the largest value added so far, or None if there are none
+
+    === Representation invariants ===
+    count >= 0
+    count == sum(self._histogram.values())
+    """
+    count: int
+    total: int
+    minimum: Optional[int]
+    maximum: Optional[int]
+    # The running mean and sum of squared differences from it, as in
+    # Welford's algorithm; only used for the variance.
+    _mean: float
+    _squares: float
+    # Maps each distinct value to the number of times it was added.
+    _histogram: Dict[int, int]
+
+    def __init__(self) -> None:
+        """Initialize an accumulator with no values."""
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self._mean = 0.0
+        self._squares = 0.0
+        self._histogram = {}
+
+    def add(self, value: int, times: int = 1) -> None:
+        """Add <value> to the statistics <times> times.
+
+        Precondition: value >= 0 and times >= 1
+        """
+        count = self.count + times
+        delta = value - self._mean
+        self._mean += delta * times / count
+        self._squares += delta * delta * self.count * times / count
+        self.count = count
+        self.total += value * times
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self._histogram[value] = self._histogram.get(value, 0) + times
+
+    def merge(self, other: RunningStats) -> None:
+        """Add every value added to <other> to these statistics, as if they
+        had been added here.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._squares += other._squares + \
+            delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+        for value, times in other._histogram.items():
+            self._histogram[value] = self._histogram.get(value, 0) + times
+
+    def mean(self) -> float:
+        """Return the mean of the values added so far (0 if there are none).
+        """
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    def variance(self) -> float:
+        """Return the population variance of the values added so far."""
+        if self.count == 0:
+            return 0.0
+        return self._squares / self.count
+
+    def percentile(self, percent: float) -> Optional[int]:
+        """Return the <percent>th percentile of the values added so far,
+        using the nearest-rank method, or None if there are no values.
+
+        Precondition: 0 <= percent <= 100
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        seen = 0
+        for value in sorted(self._histogram):
+            seen += self._histogram[value]
+            if seen >= rank:
+                return value
+        return self.maximum
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Return all of the statistics as a dictionary."""
+        return {
+            'count': self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'mean': self.mean(),
+            'variance': self.variance(),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['math'],
+        'max-nested-blocks': 4
+    })
@@ -16,12 +16,19 @@ remove any of the existing attributes.
 """
 # You may import more things from these modules (e.g., additional types from
 # typing), but you may not import from any other modules.
-from typing import Dict, List, Any
+from __future__ import annotations
+from collections import deque
+import heapq
+from typing import Dict, List, Any, Optional, Set, Union, TYPE_CHECKING
 
 import algorithms
 from algorithms import Direction
-from entities import Person, Elevator
-from visualizer import Visualizer
+from records import PersonRecord, ElevatorRecord
+from running_stats import RunningStats
+from profiling import StageProfiler
+from checkpoint import CheckpointWriter, read_snapshot, restore_snapshot
+if TYPE_CHECKING:
+    from visualizer import Visualizer
 
 
 ###############################################################################
@@ -43,6 +50,138 @@ def return_direction(direction: Direction) -> int:
         return 'Debug'
 
 
+def report_stats(round_stat: Dict[str, Any],
+                 wait_stats: RunningStats) -> Dict[str, Any]:
+    """
+    helper function fill in the time statistics of round_stat from wait_stats
+    and return it, using -1 for each of them if nobody has completed a ride
+    """
+    if wait_stats.count == 0:
+        round_stat['max_time'] = -1
+        round_stat['min_time'] = -1
+        round_stat['avg_time'] = -1
+    else:
+        round_stat['max_time'] = wait_stats.maximum
+        round_stat['min_time'] = wait_stats.minimum
+        round_stat['avg_time'] = wait_stats.mean()
+    return round_stat
+
+
+###############################################################################
+# Headless Visualizer
+###############################################################################
+class NullVisualizer:
+    """A stand-in for the Pygame visualizer that does nothing at all.
+
+    Headless simulations use this instead of visualizer.Visualizer, so that
+    Pygame is never imported when nothing is being visualized.
+    """
+
+    def render_header(self, round_num: int) -> None:
+        """Do nothing."""
+
+    def render(self) -> None:
+        """Do nothing."""
+
+    def show_arrivals(self, arrivals: Dict[int, List[PersonRecord]]) -> None:
+        """Do nothing."""
+
+    def show_boarding(self, person: PersonRecord,
+                      elevator: ElevatorRecord) -> None:
+        """Do nothing."""
+
+    def show_disembarking(self, person: PersonRecord,
+                          elevator: ElevatorRecord) -> None:
+        """Do nothing."""
+
+    def show_elevator_moves(self,
+                            elevators: List[ElevatorRecord],
+                            directions: List[Direction]) -> None:
+        """Do nothing."""
+
+    def wait(self, wait_time: int) -> None:
+        """Do nothing."""
+
+    def flush(self) -> None:
+        """Do nothing."""
+
+    def close(self) -> None:
+        """Do nothing."""
+
+
+###############################################################################
+# Profiled Visualizer
+###############################################################################
+class ProfiledVisualizer:
+    """A visualizer that times every call it passes on to another one.
+
+    Simulation.enable_profiling puts one of these in front of the
+    simulation's visualizer, and disable_profiling takes it away again.
+
+    === Attributes ===
+    visualizer: the visualizer (or NullVisualizer) being timed
+    profiler: the profiler recording each call as visualizer.<method>
+    """
+    visualizer: Union[NullVisualizer, Visualizer]
+    profiler: StageProfiler
+
+    def __init__(self, visualizer: Union[NullVisualizer, Visualizer],
+                 profiler: StageProfiler) -> None:
+        """Initialize a visualizer timing the calls of <visualizer> with
+        <profiler>.
+        """
+        self.visualizer = visualizer
+        self.profiler = profiler
+
+    def render_header(self, round_num: int) -> None:
+        """Time visualizer.render_header."""
+        self.profiler.call('visualizer.render_header',
+                           self.visualizer.render_header, round_num)
+
+    def render(self) -> None:
+        """Time visualizer.render."""
+        self.profiler.call('visualizer.render', self.visualizer.render)
+
+    def show_arrivals(self, arrivals: Dict[int, List[PersonRecord]]) -> None:
+        """Time visualizer.show_arrivals."""
+        self.profiler.call('visualizer.show_arrivals',
+                           self.visualizer.show_arrivals, arrivals)
+
+    def show_boarding(self, person: PersonRecord,
+                      elevator: ElevatorRecord) -> None:
+        """Time visualizer.show_boarding."""
+        self.profiler.call('visualizer.show_boarding',
+                           self.visualizer.show_boarding, person, elevator)
+
+    def show_disembarking(self, person: PersonRecord,
+                          elevator: ElevatorRecord) -> None:
+        """Time visualizer.show_disembarking."""
+        self.profiler.call('visualizer.show_disembarking',
+                           self.visualizer.show_disembarking, person,
+                           elevator)
+
+    def show_elevator_moves(self,
+                            elevators: List[ElevatorRecord],
+                            directions: List[Direction]) -> None:
+        """Time visualizer.show_elevator_moves."""
+        self.profiler.call('visualizer.show_elevator_moves',
+                           self.visualizer.show_elevator_moves, elevators,
+                           directions)
+
+    def wait(self, wait_time: int) -> None:
+        """Time visualizer.wait."""
+        self.profiler.call('visualizer.wait', self.visualizer.wait,
+                           wait_time)
+
+    def flush(self) -> None:
+        """Time visualizer.flush."""
+        self.profiler.call('visualizer.flush', self.visualizer.flush)
+
+    def close(self) -> None:
+        """Time visualizer.close."""
+        self.profiler.call('visualizer.close', self.visualizer.close)
+
+
 ###############################################################################
 # Main
 ###############################################################################
@@ -54,27 +193,76 @@ class Simulation:
     elevators: a list of the elevators in the simulation
     moving_algorithm: the algorithm used to decide how to move elevators
     num_floors: the number of floors
-    visualizer: the Pygame visualizer used to visualize this simulation
+    visualizer: the Pygame visualizer used to visualize this simulation,
+                or a NullVisualizer if this simulation is headless, behind
+                a ProfiledVisualizer while this simulation is profiled
     waiting: a dictionary of people waiting for an elevator
-             (keys are floor numbers, values are the list of waiting people)
+             (keys are floor numbers, values are deques of the waiting
+             people in the order they arrived),
+             which also indexes the floors where someone is waiting
     round_stat: a dictionary of str record the stats
-    waiting_people: a list of person record the current people in the elevator
-                    and on the floor who are waiting for arrival
-    people_time: a list of int record the arrived waiting times
+    waiting_people: the set of people currently in the elevators or on the
+                    floors who are waiting for arrival
+    wait_stats: the running statistics of the wait times of the people who
+                have arrived at their target floor
+    event_driven: whether to skip over rounds in which nothing can happen
+    profiler: the profiler timing the stages of each round, or None if this
+              simulation isn't being profiled
+    checkpointer: the writer saving checkpoints of this simulation every so
+                  many rounds, or None if no checkpoints are being saved
+
+    A simulation that is not visualized is headless: its people and elevators
+    are the plain records from records.py, and Pygame is never imported. A
+    visualized simulation passes the optional 'dirty_rects', 'max_frames',
+    'time_scale', 'render_every', 'record', 'offscreen' and 'drop_frames'
+    entries of its configuration on to its Visualizer. The visualizer is
+    closed when run returns, by which time every frame recorded during the
+    run is saved.
+
+    People are stamped with the round they arrive in, and their wait time is
+    only worked out when they reach their target floor (or, when visualizing,
+    when their anger level is drawn), so the cost of a round depends on the
+    people who actually arrive, board or leave rather than on everyone who is
+    still in the building.
+
+    An event-driven simulation keeps a priority queue of the next rounds in
+    which someone arrives or the elevators have work to do, and jumps
+    straight over the idle rounds in between. This gives exactly the same
+    statistics as simulating every round, provided the moving algorithm
+    keeps every elevator still when nobody is in the building (see
+    MovingAlgorithm.idle_when_empty); otherwise every round is simulated.
+
+    A headless simulation can be restored from a checkpoint of another one
+    created with the same configuration (see checkpoint.py). It then carries
+    on from the round after the checkpoint, and run gives the same
+    statistics as the simulation that was checkpointed would have.
     """
     arrival_generator: algorithms.ArrivalGenerator
-    elevators: List[Elevator]
+    elevators: List[ElevatorRecord]
     moving_algorithm: algorithms.MovingAlgorithm
     num_floors: int
-    visualizer: Visualizer
-    waiting: Dict[int, List[Person]]
+    visualizer: Union[Visualizer, NullVisualizer, ProfiledVisualizer]
+    waiting: algorithms.WaitingFloors
     round_stat: {str: int}
-    waiting_people: List[Person]
-    people_time: List[int]
+    waiting_people: Set[PersonRecord]
+    wait_stats: RunningStats
+    event_driven: bool
+    profiler: Optional[StageProfiler]
+    checkpointer: Optional[CheckpointWriter]
+    _visualize: bool
+    # The number of rounds actually simulated, which is less than the number
+    # of rounds run when an event-driven simulation skips idle rounds.
+    _simulated_rounds: int
 
     def __init__(self,
                  config: Dict[str, Any]) -> None:
         """Initialize a new simulation using the given configuration."""
+        if config['visualize']:
+            # Only visualized simulations need sprites (and so Pygame).
+            from entities import Person, Elevator
+            elevator_class, person_class = Elevator, Person
+        else:
+            elevator_class, person_class = ElevatorRecord, PersonRecord
 
         # Initialize the visualizer.
         # Note that this should be called *after* the other attributes
@@ -83,14 +271,27 @@ class Simulation:
         index = 0
         while index < (config['num_elevators']):
             empty = []
-            self.elevators.append(Elevator(empty, config['elevator_capacity']))
+            self.elevators.append(elevator_class(empty,
+                                                 config['elevator_capacity']))
 
             index += 1
         self.num_floors = config['num_floors']
-        self.visualizer = Visualizer(self.elevators,  # should be self.elevators
-                                     self.num_floors,   # should self.num_floors
-                                     config['visualize'])
-        self.waiting = {}
+        self._visualize = config['visualize']
+        if config['visualize']:
+            from visualizer import Visualizer
+            self.visualizer = Visualizer(self.elevators,
+                                         self.num_floors,
+                                         config['visualize'],
+                                         config.get('dirty_rects', False),
+                                         config.get('max_frames'),
+                                         config.get('time_scale', 1.0),
+                                         config.get('render_every', 1),
+                                         config.get('record'),
+                                         config.get('offscreen', False),
+                                         config.get('drop_frames', False))
+        else:
+            self.visualizer = NullVisualizer()
+        self.waiting = algorithms.WaitingFloors()
         self.round_stat = {
             'num_iterations': 0,
             'total_people': 0,
@@ -99,10 +300,15 @@ class Simulation:
             'min_time': 0,
             'avg_time': 0
         }
-        self.waiting_people = []
-        self.people_time = []
+        self.waiting_people = set()
+        self.wait_stats = RunningStats()
+        self.event_driven = config.get('event_driven', False)
+        self.profiler = None
+        self.checkpointer = None
+        self._simulated_rounds = 0
         self.moving_algorithm = config['moving_algorithm']
         self.arrival_generator = config['arrival_generator']
+        self.arrival_generator.person_class = person_class
 
     ############################################################################
     # Handle rounds of simulation.
@@ -116,19 +322,56 @@ class Simulation:
         Precondition: num_rounds >= 1.
 
         Note: each run of the simulation starts from the same initial state
-        (no people, all elevators are empty and start at floor 1).
+        (no people, all elevators are empty and start at floor 1), unless
+        the simulation was restored from a checkpoint, in which case the run
+        starts from the round after the checkpoint.
         """
-        self.round_stat['min_time'] = num_rounds + 1
-        for i in range(num_rounds):
-            self.round_stat['num_iterations'] = i + 1
+        start = self.round_stat['num_iterations']
+        if self.event_driven:
+            self._run_events(start, num_rounds)
+        else:
+            for i in range(start, num_rounds):
+                self._run_round(i)
+        self.round_stat['num_iterations'] = num_rounds
+        self.visualizer.close()
+        if self.checkpointer is not None:
+            self.checkpointer.flush()
+
+        return self._calculate_stats()
 
-            self.visualizer.render_header(i)
+    def step(self) -> None:
+        """Run the next round of this simulation.
 
+        Stepping lets a caller interleave the rounds of several simulations.
+        After stepping through n rounds of a new simulation, statistics
+        reports what run(n) would have returned.
+        """
+        self._run_round(self.round_stat['num_iterations'])
+
+    def statistics(self) -> Dict[str, Any]:
+        """Return a copy of the statistics of the rounds run so far."""
+        return dict(self._calculate_stats())
+
+    def _run_round(self, i: int) -> None:
+        """Run all the stages of round <i> of the simulation."""
+        self.round_stat['num_iterations'] = i + 1
+        self._simulated_rounds += 1
+
+        if self._visualize:
+            # Anger levels are drawn from wait times, so bring them up
+            # to date before rendering.
+            for person in self.waiting_people:
+                person.waited_until(i)
+        self.visualizer.render_header(i)
+
+        if self.profiler is not None:
+            self._run_profiled_stages(i)
+        else:
             # Stage 1: generate new arrivals
             self._generate_arrivals(i)
 
             # Stage 2: leave elevators
-            self._handle_leaving()
+            self._handle_leaving(i)
 
             # Stage 3: board elevators
             self._handle_boarding()
@@ -136,96 +379,203 @@ class Simulation:
             # Stage 4: move the elevators using the moving algorithm
             self._move_elevators()
 
-            # Pause for 1 second
-            self.visualizer.wait(1)
+        if self.checkpointer is not None:
+            self.checkpointer.round_done(self)
 
-            for index in range(len(self.waiting_people)):
-                self.waiting_people[index].waited()
+        # Pause for 1 second
+        self.visualizer.wait(1)
 
-        self.round_stat['avg_time'] = self.average_time()
-
-        return self._calculate_stats()
+    def _run_profiled_stages(self, i: int) -> None:
+        """Run the four stages of round <i>, as in _run_round, timing each
+        one with this simulation's profiler.
+        """
+        self.profiler.call('generate_arrivals', self._generate_arrivals, i)
+        self.profiler.call('handle_leaving', self._handle_leaving, i)
+        self.profiler.call('handle_boarding', self._handle_boarding)
+        self.profiler.call('move_elevators', self._move_elevators)
+
+    def _run_events(self, start: int, num_rounds: int) -> None:
+        """Run the simulation from round <start> up to <num_rounds>, only
+        simulating the rounds in which there is an arrival or the elevators
+        have work to do.
+        """
+        # Events are (round, kind) pairs, where kind 0 is an arrival and
+        # kind 1 is elevator work; a round can be scheduled by both.
+        events = [(start, 0)]
+        next_arrival = start
+        last = start - 1
+        while events:
+            round_num, _ = heapq.heappop(events)
+            if round_num >= num_rounds:
+                break
+            if round_num <= last:
+                continue
+            self._run_round(round_num)
+            last = round_num
+
+            if self.waiting_people or \
+                    not self.moving_algorithm.idle_when_empty:
+                heapq.heappush(events, (round_num + 1, 1))
+            if next_arrival is not None and next_arrival <= round_num:
+                next_arrival = self.arrival_generator.next_arrival_round(
+                    round_num + 1)
+                if next_arrival is not None:
+                    heapq.heappush(events, (next_arrival, 0))
 
     def _generate_arrivals(self, round_num: int) -> None:
         """Generate and visualize new arrivals."""
         round_generate = self.arrival_generator.generate(round_num)
         for item in round_generate:
+            for person in round_generate[item]:
+                person.arrival_round = round_num
             if item in self.waiting:
-                for person in round_generate[item]:
-                    self.waiting[item].append(person)
-                    self.round_stat['total_people'] += 1
-                    self.waiting_people.append(person)
+                self.waiting[item].extend(round_generate[item])
             else:
-                self.waiting[item] = round_generate[item]
-                for person in round_generate[item]:
-                    self.round_stat['total_people'] += 1
-                    self.waiting_people.append(person)
+                self.waiting[item] = deque(round_generate[item])
+            self.round_stat['total_people'] += len(round_generate[item])
+            self.waiting_people.update(round_generate[item])
+            self.waiting.update_floor(item)
         self.visualizer.show_arrivals(self.waiting)
 
-    def _handle_leaving(self) -> None:
-        """Handle people leaving elevators."""
-        index = -1
+    def _handle_leaving(self, round_num: int) -> None:
+        """Handle people leaving elevators at round <round_num>."""
         for elevator in self.elevators:
-            index += 1
-            for person in elevator.passengers:
-                if elevator.floor == person.target:
-                    self.elevators[index].passengers.remove(person)
-                    self.round_stat['people_completed'] += 1
-                    self.max_min(person.wait_time)
-                    self.people_time.append(person.wait_time)
-                    self.waiting_people.remove(person)
-                    self.visualizer.show_disembarking(person, elevator)
+            for person in elevator.unload():
+                person.waited_until(round_num)
+                self.round_stat['people_completed'] += 1
+                self.wait_stats.add(person.wait_time)
+                self.waiting_people.discard(person)
+                self.visualizer.show_disembarking(person, elevator)
 
     def _handle_boarding(self) -> None:
-        index = -1
+        """Handle boarding of people and visualize.
+
+        The people waiting on each floor board in the order they arrived,
+        for as long as the elevator has room.
+        """
         for elevator in self.elevators:
-            index += 1
-            if elevator.floor in self.waiting:
-                for person in self.waiting[elevator.floor]:
-                    if not elevator.is_full():
-                        self.elevators[index].passengers.append(person)
-                        self.waiting[elevator.floor].remove(person)
-                        """Handle boarding of people and visualize."""
-                        self.visualizer.show_boarding(person, elevator)
+            queue = self.waiting.get(elevator.floor)
+            if not queue:
+                continue
+            room = elevator.capacity - len(elevator.passengers)
+            if room <= 0:
+                continue
+            boarding = [queue.popleft()
+                        for _ in range(min(room, len(queue)))]
+            elevator.board(boarding)
+            for person in boarding:
+                self.visualizer.show_boarding(person, elevator)
+            self.waiting.update_floor(elevator.floor)
 
     def _move_elevators(self) -> None:
         """Move the elevators in this simulation.
 
         Use this simulation's moving algorithm to move the elevators.
         """
-        movement = self.moving_algorithm.move_elevators(self.elevators,
-                                                        self.waiting,
-                                                        self.num_floors)
+        movement = self._decide_moves()
         index = 0
         while index < len(self.elevators):
             self.elevators[index].floor += return_direction(movement[index])
             index += 1
         self.visualizer.show_elevator_moves(self.elevators, movement)
 
+    def _decide_moves(self) -> List[Direction]:
+        """Return the moving algorithm's directions for the elevators."""
+        if self.profiler is not None:
+            algorithm = type(self.moving_algorithm).__name__
+            return self.profiler.call(f'{algorithm}.move_elevators',
+                                      self.moving_algorithm.move_elevators,
+                                      self.elevators, self.waiting,
+                                      self.num_floors)
+        return self.moving_algorithm.move_elevators(self.elevators,
+                                                    self.waiting,
+                                                    self.num_floors)
+
+    ############################################################################
+    # Profiling
+    ############################################################################
+    def enable_profiling(self, trace: bool = True) -> StageProfiler:
+        """Start timing every stage of each round, every visualizer call and
+        every decision of the moving algorithm, and return the profiler
+        recording them.
+
+        The stages are only timed while the profiler is set, and the
+        visualizer is timed by a ProfiledVisualizer in front of it, so no
+        method of the simulation or its visualizer is replaced, and a
+        simulation that isn't profiled only checks that it isn't. If <trace>
+        is False, only the totals are kept (see StageProfiler).
+        """
+        self.disable_profiling()
+        self.profiler = StageProfiler(trace)
+        self.visualizer = ProfiledVisualizer(self.visualizer, self.profiler)
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        """Stop timing this simulation, if it is being profiled."""
+        if self.profiler is None:
+            return
+        self.visualizer = self.visualizer.visualizer
+        self.profiler = None
+
+    ############################################################################
+    # Checkpoints
+    ############################################################################
+    def enable_checkpoints(self, filename: str,
+                           every: int) -> CheckpointWriter:
+        """Start saving a checkpoint of this simulation to <filename> every
+        <every> rounds, and return the writer saving them.
+
+        Each checkpoint is taken between two rounds and written by the
+        writer's background thread, so the simulation only pays for copying
+        its state. The last checkpoint is on disk by the time run returns.
+
+        Precondition: every >= 1
+        """
+        self.disable_checkpoints()
+        self.checkpointer = CheckpointWriter(filename, every)
+        self.checkpointer.last_round = self.round_stat['num_iterations']
+        return self.checkpointer
+
+    def disable_checkpoints(self) -> None:
+        """Write any pending checkpoint, and stop saving checkpoints."""
+        if self.checkpointer is None:
+            return
+        self.checkpointer.close()
+        self.checkpointer = None
+
+    def restore(self, filename: str) -> None:
+        """Restore the checkpoint <filename> into this simulation, so that it
+        carries on from the round after the checkpoint.
+
+        Precondition: no rounds of this simulation have been run, it is
+        headless, and it was created with the same configuration as the
+        simulation that was checkpointed, except perhaps for its moving
+        algorithm (see checkpoint.restore_snapshot).
+        """
+        restore_snapshot(self, read_snapshot(filename))
+
     ############################################################################
     # Statistics calculations
     ############################################################################
-    def max_min(self, person_time: int) -> None:
-        """Comparing the max or min time"""
-        if person_time > self.round_stat['max_time']:
-            self.round_stat['max_time'] = person_time
-        if person_time < self.round_stat['min_time']:
-            self.round_stat['min_time'] = person_time
-
-    def average_time(self) -> int:
+    def average_time(self) -> float:
         """Calculate the average time"""
-        total = 0
-        for item in self.people_time:
-            total += item
-        if len(self.people_time) == 0:
-            return 0
-        else:
-            return total / len(self.people_time)
+        return self.wait_stats.mean()
+
+    def live_stats(self) -> Dict[str, Any]:
+        """Return the wait time statistics so far, including percentiles.
+
+        This can be called at any point during a run; it doesn't depend on
+        the number of people who have completed their rides.
+        """
+        return self.wait_stats.summary()
 
     def _calculate_stats(self) -> Dict[str, int]:
         """Report the statistics for the current run of this simulation.
+
+        If no person reached their target floor, the three time statistics
+        are reported as -1.
         """
-        return self.round_stat
+        return report_stats(self.round_stat, self.wait_stats)
 
 
 def sample_run() -> Dict[str, int]:
@@ -253,7 +603,9 @@ if __name__ == '__main__':
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['entities', 'visualizer', 'algorithms', 'time'],
+        'extra-imports': ['entities', 'visualizer', 'algorithms', 'records',
+                          'running_stats', 'profiling', 'checkpoint',
+                          'time', 'collections'],
         'max-nested-blocks': 4,
         'max-attributes': 12,
         'disable': ['R0201']
@@ -18,12 +18,18 @@ and PersonSprite, as you'll be implementing their subclasses.
 You can completely ignore the other Sprite classes in this file.
 """
 import random
-from typing import Any
+from typing import Any, Dict, Tuple
 import pygame
 
 
 # Images for people
 FIGURES = [f'people/person{i}.png' for i in range(1, 6)]
+# The decoded and scaled images for people, keyed by (anger level, width,
+# height, whether converted to the screen's pixel format). Each image is
+# loaded the first time it is needed, converted the first time it is needed
+# once there is a screen, and then shared by every person sprite that shows
+# it.
+_PERSON_IMAGES: Dict[Tuple[int, int, int, bool], pygame.Surface] = {}
 
 
 WHITE = (255, 255, 255)
@@ -121,9 +127,26 @@ class PersonSprite(pygame.sprite.Sprite):
     def load_image(self) -> Any:
         """Load the image for this sprite and redraws it
         Lower indices are happier :)
+
+        The image is shared with the other sprites of the same anger level
+        and size, so it must not be drawn on.
         """
-        image = pygame.image.load(FIGURES[self.get_anger_level()])
-        return pygame.transform.scale(image, (self.width, self.height))
+        converted = pygame.display.get_surface() is not None
+        key = (self.get_anger_level(), self.width, self.height, converted)
+        image = _PERSON_IMAGES.get(key)
+        if image is None:
+            # An image loaded before there was a screen is converted rather
+            # than decoded again.
+            image = _PERSON_IMAGES.get(key[:3] + (False,))
+            if image is None:
+                image = pygame.transform.scale(
+                    pygame.image.load(FIGURES[key[0]]),
+                    (self.width, self.height))
+            if converted:
+                # Match the screen's pixel format, so blitting is fast.
+                image = image.convert_alpha()
+            _PERSON_IMAGES[key] = image
+        return image
 
     def get_anger_level(self) -> int:
         """Return the anger level of this sprite.
@@ -0,0 +1,189 @@
+"""CSC148 Assignment 1 - Parameter Sweeps
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module runs many headless simulations over a grid of configurations,
+for sizing buildings. Each configuration runs in its own worker process with
+its own seed, and the statistics of each run are appended to a CSV file as
+soon as that run completes.
+
+Run this module from the command line, for example:
+
+    python sweep.py --floors 6 12 --elevators 2 4 --capacity 3 \\
+        --rate 1 2 4 --algorithm pushy look --rounds 1000 \\
+        --output results.csv
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import random
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, \
+    Tuple
+
+import algorithms
+from simulation import Simulation
+
+
+# The moving algorithms a sweep can use, by the name used in the results.
+ALGORITHMS = {
+    'random': algorithms.RandomAlgorithm,
+    'pushy': algorithms.PushyPassenger,
+    'short_sighted': algorithms.ShortSighted,
+    'look': algorithms.CollectiveLook,
+    'dispatch': algorithms.HallCallDispatcher
+}
+
+# The columns describing each run, in the order they appear in the results.
+CONFIG_FIELDS = ['run', 'seed', 'num_floors', 'num_elevators',
+                 'elevator_capacity', 'num_people_per_round',
+                 'moving_algorithm', 'num_rounds']
+STAT_FIELDS = ['num_iterations', 'total_people', 'people_completed',
+               'max_time', 'min_time', 'avg_time']
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Return every combination of the values in <grid>.
+
+    <grid> maps each configuration key to the list of values to try for it.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def run_config(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one headless simulation described by <job> and return its row.
+
+    <job> contains every key of CONFIG_FIELDS; the returned row adds the
+    statistics of the run to it.
+    """
+    # Derive separate seeds for the arrivals and the moving algorithm.
+    rng = random.Random(job['seed'])
+    arrival_seed = rng.getrandbits(32)
+    algorithm = ALGORITHMS[job['moving_algorithm']]
+    if algorithm is algorithms.RandomAlgorithm:
+        moving_algorithm = algorithm(rng.getrandbits(32))
+    else:
+        moving_algorithm = algorithm()
+    config = {
+        'num_floors': job['num_floors'],
+        'num_elevators': job['num_elevators'],
+        'elevator_capacity': job['elevator_capacity'],
+        'num_people_per_round': job['num_people_per_round'],
+        'arrival_generator': algorithms.RandomArrivals(
+            job['num_floors'], job['num_people_per_round'], arrival_seed),
+        'moving_algorithm': moving_algorithm,
+        'visualize': False
+    }
+    stats = Simulation(config).run(job['num_rounds'])
+    row = dict(job)
+    for field in STAT_FIELDS:
+        row[field] = stats[field]
+    return row
+
+
+def make_jobs(configs: List[Dict[str, Any]], num_rounds: int,
+              seed: int) -> List[Dict[str, Any]]:
+    """Return the jobs for running each of <configs> for <num_rounds>.
+
+    Run i is seeded with <seed> + i, so that a sweep is reproducible no
+    matter which worker ends up running each job.
+    """
+    jobs = []
+    for i, config in enumerate(configs):
+        job = dict(config)
+        job['run'] = i
+        job['seed'] = seed + i
+        job['num_rounds'] = num_rounds
+        jobs.append(job)
+    return jobs
+
+
+def run_jobs(jobs: List[Dict[str, Any]],
+             processes: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run <jobs> across a pool of <processes> workers.
+
+    Yield each row as soon as its run completes, so rows are not necessarily
+    in job order. If <processes> is None, use one worker per core.
+    """
+    if processes == 1:
+        for job in jobs:
+            yield run_config(job)
+        return
+    yield from imap_pool(run_config, jobs, processes)
+
+
+def imap_pool(function: Callable[[Any], Any], jobs: Iterable[Any],
+              processes: Optional[int] = None,
+              initializer: Optional[Callable[..., None]] = None,
+              initargs: Tuple = (), context: Any = multiprocessing
+              ) -> Iterator[Any]:
+    """Yield <function> of each of <jobs>, run across a pool of <processes>
+    workers (one per core if None), in the order they complete.
+
+    The pool's workers are started by <context> (multiprocessing itself, or
+    one of its contexts) and each runs <initializer> on <initargs> first,
+    if given. Every worker has exited by the time the last result is
+    yielded.
+    """
+    with context.Pool(processes, initializer, initargs) as pool:
+        yield from pool.imap_unordered(function, jobs)
+        # Leaving the with statement terminates the pool, killing workers
+        # that may still be shutting down; close it and wait for them to
+        # exit instead, so none outlives the run.
+        pool.close()
+        pool.join()
+
+
+def sweep(grid: Dict[str, List[Any]], num_rounds: int, output: str,
+          processes: Optional[int] = None, seed: int = 0) -> int:
+    """Run every configuration in <grid> for <num_rounds> and write the
+    results as CSV to the file <output>. Return the number of runs.
+
+    Rows are written (and flushed) as runs complete, so a partially finished
+    sweep still leaves every completed result on disk.
+    """
+    jobs = make_jobs(expand_grid(grid), num_rounds, seed)
+    with open(output, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, CONFIG_FIELDS + STAT_FIELDS)
+        writer.writeheader()
+        for row in run_jobs(jobs, processes):
+            writer.writerow(row)
+            csvfile.flush()
+    return len(jobs)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a sweep described by the command line arguments <argv>."""
+    parser = argparse.ArgumentParser(
+        description='Run a grid of headless elevator simulations.')
+    parser.add_argument('--floors', type=int, nargs='+', default=[6])
+    parser.add_argument('--elevators', type=int, nargs='+', default=[2])
+    parser.add_argument('--capacity', type=int, nargs='+', default=[3])
+    parser.add_argument('--rate', type=int, nargs='+', default=[2],
+                        help='people arriving per round')
+    parser.add_argument('--algorithm', nargs='+', default=['short_sighted'],
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--output', default='sweep_results.csv')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    grid = {
+        'num_floors': args.floors,
+        'num_elevators': args.elevators,
+        'elevator_capacity': args.capacity,
+        'num_people_per_round': args.rate,
+        'moving_algorithm': args.algorithm
+    }
+    count = sweep(grid, args.rounds, args.output, args.processes, args.seed)
+    print(f'Wrote {count} runs to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""CSC148 Assignment 1 - Arrival Traces
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module reads and writes arrival traces: the files that list who arrives
+in each round of a simulation.
+
+A CSV trace follows the format of sample_arrivals.csv: each line is a round
+number followed by the start and target floor of each person arriving in
+that round. CSV traces are read one line at a time, so they are never loaded
+into memory as a whole, and can be read from any line onwards given its byte
+offset.
+
+A binary trace holds the same arrivals as a sequence of (round, start,
+target) int32 records in native byte order, after an 8 byte header. It is
+read through a memory map, so replaying it involves no parsing at all.
+
+A compiled trace holds the same arrivals again, sorted by round, as columns
+rather than records: after an 8 byte header and three int32s (the number of
+people, the first round and the number of rounds from it to the last), come
+the round, start floor and target floor of every person, each as a column of
+int32s, and then an index of where each round's people start in the columns.
+It is also read through a memory map, and the people arriving in any round
+are found through the index without reading the rest of the trace.
+
+A campus trace holds the arrivals of several buildings in one CSV file: each
+line is a building name, followed by a line of a CSV trace for that building.
+"""
+import csv
+import mmap
+from array import array
+from typing import Iterable, Iterator, List, Tuple
+
+
+# The header that starts every binary trace.
+BINARY_MAGIC = b'ELVTRC1\x00'
+# The number of int32 values in each binary record.
+RECORD_SIZE = 3
+# The header that starts every compiled trace.
+COMPILED_MAGIC = b'ELVCOL1\x00'
+# The number of int32 values after the header of a compiled trace and
+# before its columns.
+COMPILED_HEADER_SIZE = 3
+
+
+def read_csv_trace(filename: str) -> Iterator[Tuple[int, List[int]]]:
+    """Yield each line of the CSV trace <filename> as a round number and the
+    list of (start, target, start, target, ...) floors on that line.
+
+    Blank lines are skipped.
+    """
+    with open(filename, newline='') as csvfile:
+        for line in csv.reader(csvfile):
+            if line:
+                yield int(line[0]), [int(floor) for floor in line[1:]]
+
+
+def read_csv_trace_from(filename: str, offset: int = 0
+                        ) -> Iterator[Tuple[int, List[int], int]]:
+    """Yield each line of the CSV trace <filename> from byte <offset> on, as
+    in read_csv_trace, along with the byte offset of the line after it.
+
+    Precondition: <offset> is 0 or an offset yielded by this function.
+    """
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(offset)
+        for line in csvfile:
+            offset += len(line)
+            cells = line.split(b',')
+            if line.strip():
+                yield int(cells[0]), [int(floor) for floor in cells[1:]], \
+                    offset
+
+
+def write_csv_trace(filename: str,
+                    lines: Iterable[Tuple[int, List[int]]]) -> None:
+    """Write <lines> to the CSV trace <filename>.
+
+    Each line is a round number and the (start, target, start, target, ...)
+    floors of the people arriving in that round.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for round_num, floors in lines:
+            writer.writerow([round_num] + list(floors))
+
+
+def read_campus_trace(filename: str) -> Iterator[Tuple[str, int, List[int]]]:
+    """Yield each line of the campus trace <filename> as a building name, a
+    round number and the list of (start, target, start, target, ...) floors
+    on that line.
+
+    Blank lines are skipped.
+    """
+    with open(filename, newline='') as csvfile:
+        for line in csv.reader(csvfile):
+            if line:
+                yield line[0], int(line[1]), [int(floor)
+                                              for floor in line[2:]]
+
+
+def write_campus_trace(filename: str,
+                       lines: Iterable[Tuple[str, int, List[int]]]) -> None:
+    """Write <lines> to the campus trace <filename>.
+
+    Each line is a building name, a round number and the (start, target,
+    start, target, ...) floors of the people arriving in that building in
+    that round.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        for building, round_num, floors in lines:
+            writer.writerow([building, round_num] + list(floors))
+
+
+def write_binary_trace(csv_filename: str, binary_filename: str) -> int:
+    """Convert the CSV trace <csv_filename> into the binary trace
+    <binary_filename>, and return the number of people in it.
+
+    Precondition: the lines of <csv_filename> are sorted by round.
+    """
+    count = 0
+    with open(binary_filename, 'wb') as binary:
+        binary.write(BINARY_MAGIC)
+        for round_num, floors in read_csv_trace(csv_filename):
+            records = array('i')
+            for index in range(1, len(floors), 2):
+                records.extend((round_num, floors[index - 1], floors[index]))
+            records.tofile(binary)
+            count += len(records) // RECORD_SIZE
+    return count
+
+
+def open_binary_trace(filename: str) -> Tuple[mmap.mmap, memoryview]:
+    """Memory map the binary trace <filename>.
+
+    Return the map (which the caller must close when done) and a view of
+    its records as a flat sequence of ints.
+    """
+    with open(filename, 'rb') as binary:
+        mapped = mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        mapped.close()
+        raise ValueError(f'{filename} is not a binary arrival trace')
+    records = memoryview(mapped)[len(BINARY_MAGIC):].cast('i')
+    return mapped, records
+
+
+def compile_trace(csv_filename: str, compiled_filename: str) -> int:
+    """Compile the CSV trace <csv_filename> into the compiled trace
+    <compiled_filename>, and return the number of people in it.
+
+    The lines of <csv_filename> can be in any order; the people arriving in
+    the same round keep the order they have in it.
+    """
+    by_round = {}
+    for round_num, floors in read_csv_trace(csv_filename):
+        people = by_round.setdefault(round_num, array('i'))
+        people.extend(floors[:len(floors) // 2 * 2])
+    rounds = sorted(by_round)
+    first = rounds[0] if rounds else 0
+    span = rounds[-1] - first + 1 if rounds else 0
+
+    round_column = array('i')
+    starts = array('i')
+    targets = array('i')
+    index = array('i', [0]) * (span + 1)
+    for round_num in rounds:
+        people = by_round[round_num]
+        starts.extend(people[0::2])
+        targets.extend(people[1::2])
+        round_column.extend([round_num] * (len(people) // 2))
+        index[round_num - first + 1] = len(starts)
+    # Rounds without arrivals start where the round before them ends.
+    for position in range(1, span + 1):
+        index[position] = max(index[position], index[position - 1])
+
+    with open(compiled_filename, 'wb') as compiled:
+        compiled.write(COMPILED_MAGIC)
+        array('i', [len(starts), first, span]).tofile(compiled)
+        for column in (round_column, starts, targets, index):
+            column.tofile(compiled)
+    return len(starts)
+
+
+class CompiledTrace:
+    """A compiled trace, memory mapped.
+
+    The people arriving in round r are those from index[r - first_round] up
+    to (but not including) index[r - first_round + 1] in the columns.
+
+    === Attributes ===
+    filename: the compiled trace
+    first_round: the first round in which anyone arrives
+    rounds: the round in which each person arrives, in increasing order
+    starts: the start floor of each person
+    targets: the target floor of each person
+    index: where the people of each round from first_round on start in the
+           columns, followed by the number of people
+
+    === Representation invariants ===
+    len(rounds) == len(starts) == len(targets)
+    index is sorted, index[0] == 0 and index[-1] == len(rounds)
+    """
+    filename: str
+    first_round: int
+    rounds: memoryview
+    starts: memoryview
+    targets: memoryview
+    index: memoryview
+    _map: mmap.mmap
+    # Every view of the map, which must be released before it is closed.
+    _views: List[memoryview]
+
+    def __init__(self, filename: str) -> None:
+        """Memory map the compiled trace <filename>."""
+        self.filename = filename
+        with open(filename, 'rb') as compiled:
+            self._map = mmap.mmap(compiled.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        if self._map[:len(COMPILED_MAGIC)] != COMPILED_MAGIC:
+            self._map.close()
+            raise ValueError(f'{filename} is not a compiled arrival trace')
+        values = memoryview(self._map)[len(COMPILED_MAGIC):].cast('i')
+        count, self.first_round, span = values[:COMPILED_HEADER_SIZE]
+        columns = [COMPILED_HEADER_SIZE + count * column
+                   for column in range(4)]
+        self.rounds = values[columns[0]:columns[1]]
+        self.starts = values[columns[1]:columns[2]]
+        self.targets = values[columns[2]:columns[3]]
+        self.index = values[columns[3]:columns[3] + span + 1]
+        self._views = [self.rounds, self.starts, self.targets, self.index,
+                       values]
+
+    def __len__(self) -> int:
+        """Return the number of people in this trace."""
+        return len(self.rounds)
+
+    def bounds(self, round_num: int) -> Tuple[int, int]:
+        """Return where the people arriving in <round_num> start and end in
+        the columns.
+        """
+        position = round_num - self.first_round
+        if 0 <= position < len(self.index) - 1:
+            return self.index[position], self.index[position + 1]
+        return 0, 0
+
+    def close(self) -> None:
+        """Unmap the trace; its columns can no longer be used."""
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._map.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['read_csv_trace', 'read_csv_trace_from',
+                       'write_csv_trace',
+                       'read_campus_trace', 'write_campus_trace',
+                       'write_binary_trace', 'open_binary_trace',
+                       'compile_trace', '__init__'],
+        'extra-imports': ['csv', 'mmap', 'array'],
+        'max-nested-blocks': 4
+    })
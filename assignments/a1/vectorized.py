@@ -0,0 +1,367 @@
+"""CSC148 Assignment 1 - Vectorized Simulation
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module contains an alternative, headless simulation engine for very
+large buildings. Instead of one Python object per person and per elevator,
+VectorSimulation keeps the state of the building in NumPy arrays, and runs
+the leave, board and move stages of each round as array operations.
+
+The moving algorithms used by this engine are the vectorized forms of the
+algorithms in algorithms.py; use `vectorize` to get the form of one of them.
+Vectorized and object simulations of the same arrivals report the same
+statistics.
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+import algorithms
+from records import PersonRecord
+from running_stats import RunningStats
+from simulation import report_stats
+
+
+###############################################################################
+# Helper Functions
+###############################################################################
+def arrival_arrays(generator: algorithms.ArrivalGenerator,
+                   round_num: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the start and target floors of the arrivals at <round_num>.
+
+    The arrays are views of the columns of the generator's PersonPool, in the
+    order <generator> gave the people.
+    """
+    pool = generator.generate_pool(round_num)
+    if len(pool) == 0:
+        empty = np.zeros(0, dtype=np.intc)
+        return empty, empty
+    return (np.frombuffer(pool.start, dtype=np.intc),
+            np.frombuffer(pool.target, dtype=np.intc))
+
+
+def group_ranks(keys: np.ndarray) -> np.ndarray:
+    """Return the rank of each element of <keys> among the equal elements
+    before it.
+
+    Precondition: <keys> is sorted.
+    """
+    firsts = np.searchsorted(keys, keys, side='left')
+    return np.arange(len(keys)) - firsts
+
+
+###############################################################################
+# Vectorized moving algorithms
+###############################################################################
+class VectorMovingAlgorithm:
+    """A moving algorithm that decides for every elevator at once."""
+
+    def move_elevators(self, sim: 'VectorSimulation') -> np.ndarray:
+        """Return the direction each elevator of <sim> should move in, as an
+        array of 1 (up), 0 (stay) and -1 (down).
+        """
+        raise NotImplementedError
+
+
+class VectorPushyPassenger(VectorMovingAlgorithm):
+    """The vectorized form of algorithms.PushyPassenger."""
+
+    def move_elevators(self, sim: 'VectorSimulation') -> np.ndarray:
+        targets = np.zeros(len(sim.elevator_floor), dtype=np.int64)
+        waiting_floors = np.flatnonzero(sim.waiting_counts())
+        if len(waiting_floors) > 0:
+            targets[sim.elevator_load == 0] = waiting_floors[0]
+
+        riding = np.flatnonzero(sim.person_elevator >= 0)
+        if len(riding) > 0:
+            # Sort passengers by elevator, then by boarding order, and take
+            # the first passenger of each elevator.
+            order = np.lexsort((sim.person_boarded[riding],
+                                sim.person_elevator[riding]))
+            riding = riding[order]
+            elevators = sim.person_elevator[riding]
+            first = np.ones(len(riding), dtype=bool)
+            first[1:] = elevators[1:] != elevators[:-1]
+            targets[elevators[first]] = sim.person_target[riding[first]]
+        return _directions(targets, sim.elevator_floor)
+
+
+class VectorShortSighted(VectorMovingAlgorithm):
+    """The vectorized form of algorithms.ShortSighted."""
+
+    def move_elevators(self, sim: 'VectorSimulation') -> np.ndarray:
+        floors = sim.elevator_floor
+        targets = np.zeros(len(floors), dtype=np.int64)
+
+        waiting_floors = np.flatnonzero(sim.waiting_counts())
+        empty = np.flatnonzero(sim.elevator_load == 0)
+        if len(waiting_floors) > 0 and len(empty) > 0:
+            # The closest waiting floor is one of the two around each floor;
+            # the lower one wins ties.
+            current = floors[empty]
+            above = np.searchsorted(waiting_floors, current)
+            below = np.maximum(above - 1, 0)
+            above = np.minimum(above, len(waiting_floors) - 1)
+            low = waiting_floors[below]
+            high = waiting_floors[above]
+            use_low = np.abs(low - current) <= np.abs(high - current)
+            targets[empty] = np.where(use_low, low, high)
+
+        riding = np.flatnonzero(sim.person_elevator >= 0)
+        if len(riding) > 0:
+            # Sort passengers by elevator, then distance, then target, and
+            # take the first passenger of each elevator.
+            elevators = sim.person_elevator[riding]
+            passenger_targets = sim.person_target[riding]
+            distances = np.abs(passenger_targets - floors[elevators])
+            order = np.lexsort((passenger_targets, distances, elevators))
+            elevators = elevators[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = elevators[1:] != elevators[:-1]
+            targets[elevators[first]] = passenger_targets[order][first]
+        return _directions(targets, floors)
+
+
+def _directions(targets: np.ndarray, floors: np.ndarray) -> np.ndarray:
+    """Return the direction from each of <floors> towards its target floor,
+    staying still where the target is 0 (no target).
+    """
+    return np.where(targets == 0, 0, np.sign(targets - floors))
+
+
+# The vectorized form of each moving algorithm in algorithms.py.
+VECTOR_ALGORITHMS = {
+    algorithms.PushyPassenger: VectorPushyPassenger,
+    algorithms.ShortSighted: VectorShortSighted
+}
+
+
+def vectorize(algorithm: Any) -> VectorMovingAlgorithm:
+    """Return the vectorized form of the moving algorithm <algorithm>.
+
+    Vectorized algorithms are returned unchanged.
+    """
+    if isinstance(algorithm, VectorMovingAlgorithm):
+        return algorithm
+    if type(algorithm) not in VECTOR_ALGORITHMS:
+        raise ValueError(f'{type(algorithm).__name__} has no vectorized form')
+    return VECTOR_ALGORITHMS[type(algorithm)]()
+
+
+###############################################################################
+# Main
+###############################################################################
+class VectorSimulation:
+    """A headless simulation whose state is stored in NumPy arrays.
+
+    People who have reached their target floor are dropped from the person
+    arrays, so these arrays only ever hold the people still in the building,
+    in the order they arrived.
+
+    === Attributes ===
+    arrival_generator: the algorithm used to generate new arrivals
+    moving_algorithm: the vectorized algorithm used to move the elevators
+    num_floors: the number of floors
+    capacity: the capacity of every elevator
+    elevator_floor: the floor each elevator is on
+    elevator_load: the number of passengers on each elevator
+    person_start: the floor each person started on
+    person_target: the floor each person wants to go to
+    person_arrival: the round each person arrived in
+    person_elevator: the elevator each person is on, or -1 if still waiting
+    person_boarded: the order in which each person boarded their elevator
+    round_stat: the statistics of this simulation, as in Simulation
+    wait_stats: the running statistics of the completed wait times
+
+    === Representation invariants ===
+    All person arrays have the same length.
+    All elevator arrays have the same length.
+    0 <= elevator_load[i] <= capacity
+    """
+    arrival_generator: algorithms.ArrivalGenerator
+    moving_algorithm: VectorMovingAlgorithm
+    num_floors: int
+    capacity: int
+    elevator_floor: np.ndarray
+    elevator_load: np.ndarray
+    person_start: np.ndarray
+    person_target: np.ndarray
+    person_arrival: np.ndarray
+    person_elevator: np.ndarray
+    person_boarded: np.ndarray
+    round_stat: Dict[str, Any]
+    wait_stats: RunningStats
+    _boarded_count: int
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Initialize a new simulation using the given configuration.
+
+        The configuration has the same keys as for Simulation, except that
+        'visualize' is ignored.
+        """
+        self.num_floors = config['num_floors']
+        self.capacity = config['elevator_capacity']
+        self.elevator_floor = np.ones(config['num_elevators'], dtype=np.int64)
+        self.elevator_load = np.zeros(config['num_elevators'], dtype=np.int64)
+        self.arrival_generator = config['arrival_generator']
+        self.arrival_generator.person_class = PersonRecord
+        self.moving_algorithm = vectorize(config['moving_algorithm'])
+
+        empty = np.zeros(0, dtype=np.int64)
+        self.person_start = empty
+        self.person_target = empty
+        self.person_arrival = empty
+        self.person_elevator = empty
+        self.person_boarded = empty
+        self._boarded_count = 0
+        self.wait_stats = RunningStats()
+        self.round_stat = {
+            'num_iterations': 0,
+            'total_people': 0,
+            'people_completed': 0,
+            'max_time': 0,
+            'min_time': 0,
+            'avg_time': 0
+        }
+
+    def waiting_counts(self) -> np.ndarray:
+        """Return the number of people waiting on each floor, indexed by floor
+        number (so index 0 is always 0).
+        """
+        waiting = self.person_elevator < 0
+        return np.bincount(self.person_start[waiting],
+                           minlength=self.num_floors + 1)
+
+    ############################################################################
+    # Handle rounds of simulation.
+    ############################################################################
+    def run(self, num_rounds: int) -> Dict[str, Any]:
+        """Run the simulation for the given number of rounds.
+
+        Return the same statistics as Simulation.run.
+
+        Precondition: num_rounds >= 1.
+        """
+        for i in range(num_rounds):
+            self.round_stat['num_iterations'] = i + 1
+            self._generate_arrivals(i)
+            self._handle_leaving(i)
+            self._handle_boarding()
+            self._move_elevators()
+        return self._calculate_stats()
+
+    def _generate_arrivals(self, round_num: int) -> None:
+        """Add the new arrivals at <round_num> to the person arrays."""
+        starts, targets = arrival_arrays(self.arrival_generator, round_num)
+        if len(starts) == 0:
+            return
+        # Waiting people are served floor by floor in arrival order, so keep
+        # the arrays sorted by arrival (and by floor within one round).
+        order = np.argsort(starts, kind='stable')
+        count = len(starts)
+        self.person_start = np.concatenate((self.person_start, starts[order]))
+        self.person_target = np.concatenate((self.person_target,
+                                             targets[order]))
+        self.person_arrival = np.concatenate(
+            (self.person_arrival, np.full(count, round_num, dtype=np.int64)))
+        self.person_elevator = np.concatenate(
+            (self.person_elevator, np.full(count, -1, dtype=np.int64)))
+        self.person_boarded = np.concatenate(
+            (self.person_boarded, np.zeros(count, dtype=np.int64)))
+        self.round_stat['total_people'] += count
+
+    def _handle_leaving(self, round_num: int) -> None:
+        """Remove the passengers whose target is their elevator's floor."""
+        riding = self.person_elevator >= 0
+        if not riding.any():
+            return
+        elevator_floors = self.elevator_floor[
+            np.where(riding, self.person_elevator, 0)]
+        leaving = riding & (self.person_target == elevator_floors)
+        if not leaving.any():
+            return
+
+        times = round_num - self.person_arrival[leaving]
+        self.round_stat['people_completed'] += len(times)
+        for time, count in zip(*np.unique(times, return_counts=True)):
+            self.wait_stats.add(int(time), int(count))
+        self.elevator_load -= np.bincount(self.person_elevator[leaving],
+                                          minlength=len(self.elevator_load))
+
+        staying = ~leaving
+        self.person_start = self.person_start[staying]
+        self.person_target = self.person_target[staying]
+        self.person_arrival = self.person_arrival[staying]
+        self.person_elevator = self.person_elevator[staying]
+        self.person_boarded = self.person_boarded[staying]
+
+    def _handle_boarding(self) -> None:
+        """Board waiting people onto the elevators on their floor.
+
+        Each floor's waiting people board in arrival order, filling the
+        elevators on that floor in elevator order.
+        """
+        # Only people on a floor with an elevator can board.
+        served = np.zeros(self.num_floors + 1, dtype=bool)
+        served[self.elevator_floor] = True
+        waiting = np.flatnonzero((self.person_elevator < 0) &
+                                 served[self.person_start])
+        if len(waiting) == 0:
+            return
+        waiting = waiting[np.argsort(self.person_start[waiting],
+                                     kind='stable')]
+        floors = self.person_start[waiting]
+        ranks = group_ranks(floors)
+
+        # Lay out the free space of the elevators floor by floor, so that
+        # the rank of a waiting person within their floor picks out the
+        # elevator they board.
+        elevator_order = np.argsort(self.elevator_floor, kind='stable')
+        elevator_floors = self.elevator_floor[elevator_order]
+        free = np.cumsum(self.capacity - self.elevator_load[elevator_order])
+        first = np.searchsorted(elevator_floors, floors, side='left')
+        last = np.searchsorted(elevator_floors, floors, side='right')
+        has_elevator = last > first
+        before = np.where(first > 0, free[np.maximum(first - 1, 0)], 0)
+        position = before + ranks
+        boarding = has_elevator & \
+            (position < free[np.maximum(last - 1, 0)])
+        if not boarding.any():
+            return
+
+        chosen = elevator_order[np.searchsorted(free, position[boarding],
+                                                side='right')]
+        boarders = waiting[boarding]
+        self.person_elevator[boarders] = chosen
+        self.person_boarded[boarders] = \
+            self._boarded_count + np.arange(len(boarders))
+        self._boarded_count += len(boarders)
+        self.elevator_load += np.bincount(chosen,
+                                          minlength=len(self.elevator_load))
+
+    def _move_elevators(self) -> None:
+        """Move the elevators using this simulation's moving algorithm."""
+        self.elevator_floor += self.moving_algorithm.move_elevators(self)
+
+    ############################################################################
+    # Statistics calculations
+    ############################################################################
+    def _calculate_stats(self) -> Dict[str, Any]:
+        """Report the statistics for the current run of this simulation,
+        in the same form as Simulation._calculate_stats.
+        """
+        return report_stats(self.round_stat, self.wait_stats)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['numpy', 'algorithms', 'records', 'running_stats',
+                          'simulation'],
+        'max-nested-blocks': 4,
+        'max-attributes': 15,
+        'disable': ['R0201']
+    })
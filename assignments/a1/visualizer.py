@@ -14,12 +14,14 @@ DO NOT CHANGE ANY CODE IN THIS FILE. You don't need to for this assignment,
 and in fact you aren't even submitting this file!
 """
 from __future__ import annotations
+import os
 import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import pygame
 from algorithms import Direction
+from recording import FrameRecorder
 import sprites
 
 
@@ -34,6 +36,12 @@ FLOOR_BORDER_HEIGHT = 10  # The height of the border
 
 # FPS based on config speed
 FPS = 60
+# The range of time scales that the up and down arrow keys move between
+MIN_TIME_SCALE = 0.01
+MAX_TIME_SCALE = 10
+# The SDL video drivers that draw without a display, where nobody can resume
+# a paused simulation
+HEADLESS_DRIVERS = ('dummy', 'offscreen')
 
 
 class Visualizer:
@@ -45,10 +53,41 @@ class Visualizer:
     def __init__(self,
                  elevators: List[sprites.ElevatorSprite],
                  num_floors: int,
-                 visualize: bool) -> None:
+                 visualize: bool,
+                 dirty_rects: bool = False,
+                 max_frames: Optional[int] = None,
+                 time_scale: float = 1.0,
+                 render_every: int = 1,
+                 record: Optional[str] = None,
+                 offscreen: bool = False,
+                 drop_frames: bool = False) -> None:
         """Initialize this visualization.
 
         If visualize is False, this instance does nothing.
+
+        If dirty_rects is True, the floors are drawn once, and each frame
+        only repaints the parts of the screen under the elevators, the people
+        and the header.
+
+        If max_frames is not None, each animation has at most max_frames
+        frames, and at most max_frames frames are drawn in each round; the
+        rest are skipped, except that the last state of a round is always
+        shown.
+
+        time_scale speeds up (above 1) or slows down (below 1) both the
+        animations and the wait between rounds. If render_every is more than
+        1, only every render_every-th round is drawn and waited for; the
+        rounds in between are fast-forwarded.
+
+        If record is not None, every frame drawn is also saved to record by
+        a recording.FrameRecorder; if drop_frames is True, frames are
+        dropped rather than waited for when its writer falls behind. If
+        offscreen is True, frames are drawn with SDL's dummy video driver
+        instead of in a window, so no display is needed, and nothing is
+        waited for; the video driver is set back when this visualization is
+        closed. Pausing is only possible with a display (see wait).
+
+        Precondition: time_scale > 0 and render_every >= 1
         """
         self._visualize = visualize
         if not self._visualize:
@@ -56,20 +95,56 @@ class Visualizer:
 
         self._num_elevators = len(elevators)
         self._num_floors = num_floors
+        self._dirty_rects = dirty_rects
+        self._max_frames = max_frames
+        # The frames drawn so far this round, and whether a frame was skipped
+        # since the last one drawn.
+        self._frames_drawn = 0
+        self._stale = False
+        self._time_scale = time_scale
+        self._render_every = render_every
+        # Whether the current round is being drawn, and whether the
+        # simulation is paused.
+        self._showing = True
+        self._paused = False
+        self._offscreen = offscreen
 
         # pygame stuff
+        # The video driver to set back on closing, if offscreen.
+        self._video_driver = os.environ.get('SDL_VIDEODRIVER')
+        if offscreen:
+            pygame.display.quit()
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
         pygame.init()
         self._clock = pygame.time.Clock()
 
         self._screen = pygame.display.set_mode(
             (WIDTH, self._total_height()), pygame.HWSURFACE | pygame.DOUBLEBUF)
+        # Whether someone can be at the window to pause and resume.
+        self._interactive = not offscreen and \
+            pygame.display.get_driver() not in HEADLESS_DRIVERS
         self._screen.fill(WHITE)
-
-        # Contains all sprites in the simulation
-        self._sprite_group = pygame.sprite.Group()
-        self._stats_group = pygame.sprite.Group()
+        self._recorder = None
+        if record is not None:
+            self._recorder = FrameRecorder(record, self._screen.get_size(),
+                                           drop_frames=drop_frames)
+
+        if dirty_rects:
+            # The floors never move, so they are drawn on the background
+            # instead of being in a sprite group.
+            self._background = pygame.Surface(self._screen.get_size())
+            self._background.fill(WHITE)
+            self._sprite_group = pygame.sprite.RenderUpdates()
+            self._stats_group = pygame.sprite.RenderUpdates()
+        else:
+            # Contains all sprites in the simulation
+            self._sprite_group = pygame.sprite.Group()
+            self._stats_group = pygame.sprite.Group()
 
         self._setup_sprites(elevators)
+        if dirty_rects:
+            self._screen.blit(self._background, (0, 0))
+            pygame.display.flip()
         # Initial render.
         self.render()
 
@@ -77,6 +152,10 @@ class Visualizer:
         """Render text displaying the round number for this simulation."""
         if not self._visualize:
             return
+        self._showing = round_num % self._render_every == 0
+        if not self._showing:
+            return
+        self._frames_drawn = 0
         self._stats_group.remove(list(self._stats_group))
         self._stats_group.add(sprites.StatLine(0, f'Round {round_num}'))
         for sprite in self._sprite_group:
@@ -99,18 +178,61 @@ class Visualizer:
 
     def render(self) -> None:
         """Draw the current state of the simulation to the screen.
+
+        The frame is skipped if this round isn't being drawn, or has already
+        used up its max_frames.
         """
-        if not self._visualize:
+        if not self._visualize or not self._showing:
             return
 
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
 
-        self._screen.fill(WHITE)
-        self._sprite_group.draw(self._screen)
-        self._stats_group.draw(self._screen)
-        self._clock.tick(FPS)
-        pygame.display.flip()
+        if self._max_frames is not None and \
+                self._frames_drawn >= self._max_frames:
+            self._stale = True
+            return
+        self._frames_drawn += 1
+        self._draw()
+
+    def _draw(self) -> None:
+        """Draw one frame."""
+        self._stale = False
+        if self._dirty_rects:
+            self._stats_group.clear(self._screen, self._background)
+            self._sprite_group.clear(self._screen, self._background)
+            changed = self._sprite_group.draw(self._screen)
+            changed += self._stats_group.draw(self._screen)
+            self._tick()
+            pygame.display.update(changed)
+        else:
+            self._screen.fill(WHITE)
+            self._sprite_group.draw(self._screen)
+            self._stats_group.draw(self._screen)
+            self._tick()
+            pygame.display.flip()
+        if self._recorder is not None:
+            self._recorder.capture(self._screen)
+
+    def _tick(self) -> None:
+        """Hold the frame rate down to the scaled FPS, unless offscreen."""
+        if not self._offscreen:
+            self._clock.tick(FPS * self._time_scale)
+
+    def _frames(self, first: int, last: int) -> List[int]:
+        """Return the frames from <first> to <last> of an animation that
+        should be drawn: all of them, or at most max_frames of them evenly
+        spread out and ending with <last>.
+
+        Only <last> is needed in rounds that aren't being drawn.
+        """
+        if not self._showing:
+            return [last]
+        count = last - first + 1
+        if self._max_frames is None or self._max_frames >= count:
+            return list(range(first, last + 1))
+        shown = max(self._max_frames, 1)
+        return [first - 1 + count * i // shown for i in range(1, shown + 1)]
 
     def show_arrivals(self,
                       arrivals: Dict[int, List[sprites.PersonSprite]]) -> None:
@@ -139,7 +261,7 @@ class Visualizer:
         from_x = 10
         target_x = elevator.rect.centerx + random.randint(-3, 3)
 
-        for frame in range(21):  # Move in 20 seconds
+        for frame in self._frames(0, 20):  # Move in 20 seconds
             person.rect.centerx = from_x + (target_x - from_x) * frame // 20
             self.render()
 
@@ -157,7 +279,7 @@ class Visualizer:
 
         elevator.update()
 
-        for frame in range(21):  # Move in 20 seconds
+        for frame in self._frames(0, 20):  # Move in 20 seconds
             x = from_x + (target_x - from_x) * frame // 20
             person.rect.centerx = x
             self.render()
@@ -169,28 +291,98 @@ class Visualizer:
         if not self._visualize:
             return
 
-        for _ in range(20):  # Move in 20 seconds
-            for elevator, direction in zip(elevators, directions):
+        # Positions are worked out from where everything started, so that
+        # skipped frames don't change where anything ends up.
+        starts = [(elevator.rect.bottom,
+                   [passenger.rect.bottom for passenger in elevator.passengers])
+                  for elevator in elevators]
+        for frame in self._frames(1, 20):  # Move in 20 seconds
+            for elevator, direction, (bottom, passenger_bottoms) in zip(
+                    elevators, directions, starts):
                 if direction == Direction.UP:
-                    step = - FLOOR_HEIGHT / 20
+                    step = - FLOOR_HEIGHT * frame // 20
                 elif direction == Direction.DOWN:
-                    step = FLOOR_HEIGHT / 20
+                    step = FLOOR_HEIGHT * frame // 20
                 else:
                     step = 0
-                elevator.rect.bottom += step
-                for passenger in elevator.passengers:
-                    passenger.rect.bottom += step
+                elevator.rect.bottom = bottom + step
+                for passenger, passenger_bottom in zip(elevator.passengers,
+                                                       passenger_bottoms):
+                    passenger.rect.bottom = passenger_bottom + step
 
             self.render()
 
     def wait(self, wait_time: int) -> None:
-        """Wait for the specified amount of time, in seconds.
+        """Wait for the specified amount of time, in seconds, divided by the
+        time scale.
 
         Only occurs if self.visualize is true, otherwise there's no need to
-        wait.
+        wait. Rounds that aren't drawn aren't waited for either.
+
+        The window keeps handling events while waiting: space pauses and
+        resumes the simulation, the right arrow key steps one round while it
+        is paused, the up and down arrow keys double and halve the time
+        scale, and closing the window lets the rest of the simulation run
+        without being visualized.
+
+        A paused simulation waits here, with no timeout, until it is resumed
+        or the window is closed. So that nothing can wait forever without a
+        display, the pause and step keys are ignored when drawing offscreen
+        or with one of SDL's HEADLESS_DRIVERS.
+        """
+        if not self._visualize or not self._showing:
+            return
+        if self._stale:
+            self._draw()
+        if self._offscreen:
+            return
+        deadline = time.perf_counter() + wait_time / self._time_scale
+        while self._visualize and \
+                (self._paused or time.perf_counter() < deadline):
+            for event in pygame.event.get():
+                if self._handle_event(event):
+                    return
+            self._clock.tick(FPS)
+
+    def flush(self) -> None:
+        """Wait until every frame recorded so far has been saved."""
+        if self._visualize and self._recorder is not None:
+            self._recorder.flush()
+
+    def close(self) -> None:
+        """Save the frames recorded so far, stop recording and close the
+        window; nothing more is visualized.
+        """
+        if not self._visualize:
+            return
+        self._visualize = False
+        if self._recorder is not None:
+            self._recorder.close()
+        pygame.display.quit()
+        if self._offscreen:
+            if self._video_driver is None:
+                del os.environ['SDL_VIDEODRIVER']
+            else:
+                os.environ['SDL_VIDEODRIVER'] = self._video_driver
+
+    def _handle_event(self, event: pygame.event.Event) -> bool:
+        """Handle the window event <event>, and return whether to stop
+        waiting for the current round.
         """
-        if self._visualize:
-            time.sleep(wait_time)
+        if event.type == pygame.QUIT:
+            self.close()
+            return True
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == pygame.K_SPACE:
+            self._paused = self._interactive and not self._paused
+        elif event.key == pygame.K_RIGHT:
+            return self._paused
+        elif event.key == pygame.K_UP:
+            self._time_scale = min(self._time_scale * 2, MAX_TIME_SCALE)
+        elif event.key == pygame.K_DOWN:
+            self._time_scale = max(self._time_scale / 2, MIN_TIME_SCALE)
+        return False
 
     def _setup_sprites(self, elevators: List[sprites.ElevatorSprite]) -> None:
         """Set up the initial sprites for this visualization.
@@ -203,8 +395,12 @@ class Visualizer:
             y = self.get_y_of_floor(i)
             floor = sprites.FloorSprite(WIDTH, FLOOR_HEIGHT, y)
             floor_num = sprites.FloorNum(y - 20, str(i))
-            self._sprite_group.add(floor_num)
-            self._sprite_group.add(floor)
+            if self._dirty_rects:
+                self._background.blit(floor_num.image, floor_num.rect)
+                self._background.blit(floor.image, floor.rect)
+            else:
+                self._sprite_group.add(floor_num)
+                self._sprite_group.add(floor)
 
         for i, elevator in enumerate(elevators):
             elevator.rect.centerx =\
@@ -217,6 +413,7 @@ class Visualizer:
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['random', 'pygame', 'time', 'algorithms'],
+        'extra-imports': ['os', 'random', 'pygame', 'time', 'algorithms',
+                          'recording'],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,228 @@
+"""CSC148 Assignment 1 - What-if Comparisons
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module description ===
+This module compares moving algorithms from one state of a simulation: the
+simulation is snapshotted at some round (see checkpoint.py), and each
+algorithm then runs on its own branch of the snapshot for the same number of
+rounds. Every branch starts from exactly the same people and elevators and
+sees exactly the same arrivals, so the comparison is paired, and the rounds
+before the snapshot are simulated only once.
+
+A branch is a new headless simulation restored from the snapshot, so it
+never copies a sprite or anything else of the snapshotted simulation, which
+can carry on running. Each branch gets an arrival generator of its own,
+made by the configuration's 'arrival_factory' if it has one, or else copied
+from its 'arrival_generator', since not every generator's getstate captures
+everything it has left to generate. Branches can run in this process, one
+after the other, or across a pool of worker processes. Where the operating
+system can fork, the workers are forked after the snapshot is taken, so
+they share its memory copy-on-write instead of each being sent a copy of it.
+
+Elsewhere the snapshot and configuration are pickled for each worker. A
+generator holding a memory map (MappedFileArrivals or CompiledFileArrivals)
+can't be copied or pickled, so to compare from a snapshot of a simulation
+using one, give the configuration an 'arrival_factory' that opens the trace
+again, such as functools.partial(MappedFileArrivals, max_floor, filename);
+the configuration's 'arrival_generator' is then never copied or sent to a
+worker.
+
+Each branch reports the statistics of its own rounds only: the people who
+arrived and completed their rides during those rounds, the wait times of
+the people who completed, and the number of people still waiting or riding
+at the end, since an algorithm can keep its wait times low by leaving people
+behind.
+
+Run this module from the command line, for example:
+
+    python whatif.py --floors 50 --elevators 8 --rate 2 --warmup 2000 \\
+        --rounds 500 --processes 4
+"""
+import argparse
+import copy
+import multiprocessing
+from typing import Any, Dict, List, Optional, Tuple
+
+import algorithms
+from benchmark import make_config
+from checkpoint import Snapshot, restore_snapshot
+from running_stats import RunningStats
+from simulation import Simulation, report_stats
+from sweep import ALGORITHMS, imap_pool
+
+
+# The snapshot and configuration the branches of a comparison start from,
+# set before the worker processes are forked so that they inherit it.
+_BRANCH_FROM: Optional[Tuple[Snapshot, Dict[str, Any]]] = None
+
+
+def fork_simulation(snapshot: Snapshot, config: Dict[str, Any],
+                    moving_algorithm: algorithms.MovingAlgorithm
+                    ) -> Simulation:
+    """Return a new headless simulation of <config>, restored from
+    <snapshot>, that moves its elevators with <moving_algorithm>.
+
+    The simulation's arrival generator is made by config['arrival_factory'],
+    a function of no arguments, if there is one, and is otherwise a copy of
+    config['arrival_generator'], which is left as it was.
+
+    Precondition: <config> is the configuration of the snapshotted
+    simulation, except for its moving algorithm and for the state of its
+    arrival generator, which is replaced by the snapshot's. Its arrival
+    generator or factory gives the arrivals of the rounds after the
+    snapshot, wherever getstate doesn't capture them.
+    """
+    branch_config = dict(config)
+    if 'arrival_factory' in config:
+        branch_config['arrival_generator'] = config['arrival_factory']()
+    else:
+        branch_config['arrival_generator'] = \
+            copy.deepcopy(config['arrival_generator'])
+    branch_config['moving_algorithm'] = moving_algorithm
+    branch_config['visualize'] = False
+    sim = Simulation(branch_config)
+    restore_snapshot(sim, snapshot)
+    return sim
+
+
+def run_branch(job: Tuple[str, int, int]) -> Tuple[str, Dict[str, Any]]:
+    """Run one branch of a comparison.
+
+    <job> is the name of a moving algorithm (one of sweep.ALGORITHMS), the
+    number of rounds to run it for, and the seed of the random algorithm.
+    Return the name and the statistics of the branch's rounds.
+    """
+    name, num_rounds, seed = job
+    snapshot, config = _BRANCH_FROM
+    algorithm = ALGORITHMS[name]
+    if algorithm is algorithms.RandomAlgorithm:
+        moving_algorithm = algorithm(seed)
+    else:
+        moving_algorithm = algorithm()
+    sim = fork_simulation(snapshot, config, moving_algorithm)
+    sim.wait_stats = RunningStats()
+    sim.run(snapshot.num_iterations + num_rounds)
+    round_stat = {
+        'num_iterations': num_rounds,
+        'total_people': sim.round_stat['total_people'] -
+                        snapshot.total_people,
+        'people_completed': sim.round_stat['people_completed'] -
+                            snapshot.people_completed,
+        'people_left': len(sim.waiting_people)
+    }
+    return name, report_stats(round_stat, sim.wait_stats)
+
+
+def _start_worker(snapshot: Snapshot, config: Dict[str, Any]) -> None:
+    """Give a worker that wasn't forked the snapshot and configuration its
+    branches start from.
+    """
+    global _BRANCH_FROM
+    _BRANCH_FROM = (snapshot, config)
+
+
+def compare_from(snapshot: Snapshot, config: Dict[str, Any],
+                 num_rounds: int, names: Optional[List[str]] = None,
+                 processes: Optional[int] = 1, seed: int = 0
+                 ) -> Dict[str, Dict[str, Any]]:
+    """Run each of the moving algorithms in <names> (all of sweep.ALGORITHMS
+    by default) for <num_rounds> from <snapshot>, and return the statistics
+    of each one's rounds by name, in the order of <names>.
+
+    If <processes> is 1, the branches run one after the other in this
+    process; otherwise they run across a pool of <processes> workers (one
+    per core if None). <seed> seeds the random algorithm, unless the
+    snapshot was taken with it, in which case it carries on with the
+    snapshot's random number generator.
+
+    Precondition: <config> is as for fork_simulation.
+    """
+    global _BRANCH_FROM
+    names = names or sorted(ALGORITHMS)
+    jobs = [(name, num_rounds, seed) for name in names]
+    if 'arrival_factory' in config:
+        config = {key: value for key, value in config.items()
+                  if key != 'arrival_generator'}
+    _BRANCH_FROM = (snapshot, config)
+    try:
+        if processes == 1:
+            results = dict(map(run_branch, jobs))
+        else:
+            results = _run_pool(jobs, processes)
+    finally:
+        _BRANCH_FROM = None
+    return {name: results[name] for name in names}
+
+
+def _run_pool(jobs: List[Tuple[str, int, int]], processes: Optional[int]
+              ) -> Dict[str, Dict[str, Any]]:
+    """Run the branch <jobs> across a pool of <processes> workers, and
+    return their statistics by name.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # The workers inherit _BRANCH_FROM when they are forked.
+        branches = imap_pool(run_branch, jobs, processes,
+                             context=multiprocessing.get_context('fork'))
+    else:
+        branches = imap_pool(run_branch, jobs, processes, _start_worker,
+                             _BRANCH_FROM)
+    return dict(branches)
+
+
+def compare_algorithms(sim: Simulation, config: Dict[str, Any],
+                       num_rounds: int, names: Optional[List[str]] = None,
+                       processes: Optional[int] = 1, seed: int = 0
+                       ) -> Dict[str, Dict[str, Any]]:
+    """Snapshot <sim> at its current round, and compare the moving
+    algorithms from there as in compare_from.
+
+    <sim> is left as it was, and can carry on running.
+    """
+    return compare_from(Snapshot(sim), config, num_rounds, names, processes,
+                        seed)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Warm up the simulation described by the command line arguments
+    <argv>, compare the moving algorithms from there, and print their
+    statistics side by side.
+    """
+    parser = argparse.ArgumentParser(
+        description='Compare moving algorithms from one simulation state.')
+    parser.add_argument('--floors', type=int, default=50)
+    parser.add_argument('--elevators', type=int, default=8)
+    parser.add_argument('--capacity', type=int, default=8)
+    parser.add_argument('--rate', type=int, default=2)
+    parser.add_argument('--warmup', type=int, default=1000,
+                        help='rounds to run before the snapshot')
+    parser.add_argument('--warmup-algorithm', default='look',
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('--rounds', type=int, default=500,
+                        help='rounds to run each algorithm for')
+    parser.add_argument('--algorithm', nargs='+', default=None,
+                        choices=sorted(ALGORITHMS))
+    parser.add_argument('--processes', type=int, default=1,
+                        help='worker processes (0 for one per core)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    arguments = (args.floors, args.elevators, args.capacity, args.rate,
+                 args.warmup_algorithm, args.seed)
+    sim = Simulation(make_config(*arguments))
+    sim.run(args.warmup)
+    results = compare_algorithms(sim, make_config(*arguments), args.rounds,
+                                 args.algorithm, args.processes or None,
+                                 args.seed)
+    print(f'{"algorithm":<16}{"arrived":>10}{"completed":>10}{"left":>8}'
+          f'{"avg":>10}{"max":>8}')
+    for name, stats in results.items():
+        print(f'{name:<16}{stats["total_people"]:>10}'
+              f'{stats["people_completed"]:>10}{stats["people_left"]:>8}'
+              f'{stats["avg_time"]:>10.1f}{stats["max_time"]:>8}')
+
+
+if __name__ == '__main__':
+    main()